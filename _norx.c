@@ -0,0 +1,128 @@
+/*
+   C backend for the NORX permutation and full-block payload loops.
+   ------
+
+   Loaded through ctypes by norx_c.py, the state is an array of 16 words
+   and only complete rate blocks are processed here.
+
+   :license: CC0, see LICENSE for more details.
+*/
+
+#include <stddef.h>
+#include <stdint.h>
+
+#define WORDS_RATE 10
+
+#define ROTR32(x, c) (((x) >> (c)) | ((x) << (32 - (c))))
+#define ROTR64(x, c) (((x) >> (c)) | ((x) << (64 - (c))))
+#define H(a, b) (((a) ^ (b)) ^ (((a) & (b)) << 1))
+
+#define G32(a, b, c, d)                  \
+    do {                                 \
+        a = H(a, b); d = ROTR32(a ^ d, 8);  \
+        c = H(c, d); b = ROTR32(b ^ c, 11); \
+        a = H(a, b); d = ROTR32(a ^ d, 16); \
+        c = H(c, d); b = ROTR32(b ^ c, 31); \
+    } while (0)
+
+#define G64(a, b, c, d)                  \
+    do {                                 \
+        a = H(a, b); d = ROTR64(a ^ d, 8);  \
+        c = H(c, d); b = ROTR64(b ^ c, 19); \
+        a = H(a, b); d = ROTR64(a ^ d, 40); \
+        c = H(c, d); b = ROTR64(b ^ c, 63); \
+    } while (0)
+
+#define F(G, S)                                \
+    do {                                       \
+        G(S[0], S[4], S[8], S[12]);            \
+        G(S[1], S[5], S[9], S[13]);            \
+        G(S[2], S[6], S[10], S[14]);           \
+        G(S[3], S[7], S[11], S[15]);           \
+        G(S[0], S[5], S[10], S[15]);           \
+        G(S[1], S[6], S[11], S[12]);           \
+        G(S[2], S[7], S[8], S[13]);            \
+        G(S[3], S[4], S[9], S[14]);            \
+    } while (0)
+
+static uint32_t load32(const uint8_t *p)
+{
+    return (uint32_t)p[0] | (uint32_t)p[1] << 8 | (uint32_t)p[2] << 16 | (uint32_t)p[3] << 24;
+}
+
+static uint64_t load64(const uint8_t *p)
+{
+    return (uint64_t)load32(p) | (uint64_t)load32(p + 4) << 32;
+}
+
+static void store32(uint8_t *p, uint32_t x)
+{
+    p[0] = (uint8_t)x; p[1] = (uint8_t)(x >> 8); p[2] = (uint8_t)(x >> 16); p[3] = (uint8_t)(x >> 24);
+}
+
+static void store64(uint8_t *p, uint64_t x)
+{
+    store32(p, (uint32_t)x);
+    store32(p + 4, (uint32_t)(x >> 32));
+}
+
+static void permute32(uint32_t *S, int r)
+{
+    int i;
+    for (i = 0; i < r; ++i)
+        F(G32, S);
+}
+
+static void permute64(uint64_t *S, int r)
+{
+    int i;
+    for (i = 0; i < r; ++i)
+        F(G64, S);
+}
+
+void norx_permute(int w, int r, void *S)
+{
+    if (w == 32)
+        permute32((uint32_t *)S, r);
+    else
+        permute64((uint64_t *)S, r);
+}
+
+/* mode 0 absorbs, mode 1 encrypts and mode 2 decrypts the given number of full blocks, mode 3 performs
+   the state update of mode 2 without writing any plaintext */
+#define BLOCKS(W)                                                               \
+    static void blocks##W(uint##W##_t *S, int r, int mode, uint##W##_t tag,     \
+                          const uint8_t *in, uint8_t *out, size_t blocks)       \
+    {                                                                           \
+        size_t i, j;                                                            \
+        for (i = 0; i < blocks; ++i) {                                          \
+            S[15] ^= tag;                                                       \
+            permute##W(S, r);                                                   \
+            for (j = 0; j < WORDS_RATE; ++j) {                                  \
+                uint##W##_t x = load##W(in + (W / 8) * j);                      \
+                if (mode >= 2) {                                                \
+                    if (mode == 2)                                              \
+                        store##W(out + (W / 8) * j, S[j] ^ x);                  \
+                    S[j] = x;                                                   \
+                } else {                                                        \
+                    S[j] ^= x;                                                  \
+                    if (mode == 1)                                              \
+                        store##W(out + (W / 8) * j, S[j]);                      \
+                }                                                               \
+            }                                                                   \
+            in += (W / 8) * WORDS_RATE;                                         \
+            if (mode == 1 || mode == 2)                                         \
+                out += (W / 8) * WORDS_RATE;                                    \
+        }                                                                       \
+    }
+
+BLOCKS(32)
+BLOCKS(64)
+
+void norx_blocks(int w, int r, int mode, uint64_t tag, void *S, const uint8_t *in, uint8_t *out, size_t blocks)
+{
+    if (w == 32)
+        blocks32((uint32_t *)S, r, mode, (uint32_t)tag, in, out, blocks);
+    else
+        blocks64((uint64_t *)S, r, mode, tag, in, out, blocks);
+}
@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+"""
+   Benchmarks for NORX.
+   ------
+
+   Usage: bench.py                            run the individual benchmarks
+          bench.py --suite [--json FILE]      measure every configuration, optionally saved as JSON
+          bench.py --compare OLD NEW          flag slowdowns of NEW against OLD beyond --threshold
+          bench.py --interpreters PY [PY ...] startup and throughput per interpreter, the first is the baseline
+          bench.py --startup                  time from interpreter start to import and to the first aead_encrypt
+
+   :license: CC0, see LICENSE for more details.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser
+from multiprocessing import cpu_count
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import time
+
+from norx import NORX, NORXKey
+
+
+def bench_permute(count=2000):
+    # permutations per second of the reference round function against the specialised permutation
+    for pw in [32, 64]:
+        norx = NORX(pw)
+        S = [0] * 16
+        start = time()
+        for i in range(count):
+            for j in range(norx.NORX_R):
+                norx.F(S)
+        before = count / (time() - start)
+        start = time()
+        for i in range(count):
+            norx.permute(S)
+        after = count / (time() - start)
+        print('NORX{}, permute: {:10.2f} -> {:10.2f} permutations/s ({:.2f}x)'.format(
+            pw, before, after, after / before))
+
+
+def bench_parallel(size=1 << 18):
+    # throughput of the parallel payload modes against the sequential D = 1 mode
+    cores = cpu_count()
+    m = b'\x00' * size
+    for pw in [32, 64]:
+        k, n = b'\x00' * (4*pw//8), b'\x00' * (2*pw//8)
+        base = None
+        for pd in [1, 2, 4, 0]:
+            norx = NORX(pw, 4, pd, 4*pw, workers=cores)
+            start = time()
+            norx.aead_encrypt(b'', m, b'', n, k)
+            rate = size / (time() - start) / 1024
+            base = base or rate
+            print('NORX{}-{}, {} cores: {:10.2f} KiB/s ({:.2f}x)'.format(pw, pd, cores, rate, rate / base))
+
+
+def bench_batch(count=1000, size=64):
+    # records per second of the vectorised batch API against a loop over aead_encrypt
+    try:
+        import numpy
+    except ImportError:
+        print('NORX batch: numpy not available, benchmark skipped.')
+        return
+    for pw in [32, 64]:
+        norx = NORX(pw)
+        hs, ms, ts = [b''] * count, [b'\x00' * size] * count, [b''] * count
+        ns, ks = [b'\x00' * (2*pw//8)] * count, [b'\x00' * (4*pw//8)] * count
+        start = time()
+        for i in range(count):
+            norx.aead_encrypt(hs[i], ms[i], ts[i], ns[i], ks[i])
+        before = count / (time() - start)
+        start = time()
+        norx.aead_encrypt_batch(hs, ms, ts, ns, ks)
+        after = count / (time() - start)
+        print('NORX{}, batch of {} x {} B: {:10.2f} -> {:10.2f} records/s ({:.2f}x)'.format(
+            pw, count, size, before, after, after / before))
+
+
+def bench_file(size=1 << 22, chunk=1 << 20):
+    # throughput of chunked file encryption and decryption, pass size=1 << 30 for GB-scale numbers
+    import norx_file
+    cores = cpu_count()
+    k = b'\x00' * 32
+    tmp = mkdtemp()
+    try:
+        src, enc, dec = [os.path.join(tmp, x) for x in ['src', 'enc', 'dec']]
+        f = open(src, 'wb')
+        for i in range(0, size, chunk):
+            f.write(os.urandom(min(chunk, size - i)))
+        f.close()
+        start = time()
+        norx_file.encrypt_file(src, enc, k, chunk=chunk, workers=cores)
+        middle = time()
+        norx_file.decrypt_file(enc, dec, k, workers=cores)
+        end = time()
+        print('NORX64 file of {} MiB, {} cores: enc {:10.2f} KiB/s, dec {:10.2f} KiB/s'.format(
+            size >> 20, cores, size / (middle - start) / 1024, size / (end - middle) / 1024))
+    finally:
+        rmtree(tmp)
+
+
+def bench_seek(size=1 << 22, read=1 << 12, count=50):
+    # latency of reads at random offsets of a seekable container against decrypting all of it
+    import random
+    from io import BytesIO
+    import norx_seek
+    k = b'\x00' * 32
+    f = BytesIO()
+    with norx_seek.NORXWriter(f, k) as w:
+        w.write(os.urandom(size))
+    c = f.getvalue()
+    start = time()
+    norx_seek.NORXReader(BytesIO(c), k).read()
+    whole = time() - start
+    r = norx_seek.NORXReader(BytesIO(c), k)
+    rng = random.Random(0)
+    start = time()
+    for i in range(count):
+        r.seek(rng.randrange(size))
+        r.read(read)
+    after = (time() - start) / count
+    print('NORX64 container of {} MiB, {} B at random offsets: {:.4f} -> {:.4f} s per read ({:.2f}x)'.format(
+        size >> 20, read, whole, after, whole / after))
+
+
+def bench_seal_many(count=4000, size=64, chunksize=256):
+    # records per second of seal_many for 1, 2, 4, ... workers up to the core count against a loop over aead_encrypt
+    cores = cpu_count()
+    for pw in [32, 64]:
+        norx = NORX(pw)
+        records = [(b'', os.urandom(size), b'', os.urandom(2*pw//8), b'\x00' * (4*pw//8)) for i in range(count)]
+        start = time()
+        for r in records:
+            norx.aead_encrypt(*r)
+        base = count / (time() - start)
+        print('NORX{}, {} x {} B, aead_encrypt: {:10.2f} records/s'.format(pw, count, size, base))
+        workers = 1
+        while True:
+            start = time()
+            for c in norx.seal_many(records, workers, chunksize):
+                pass
+            rate = count / (time() - start)
+            print('NORX{}, {} x {} B, seal_many with {} workers: {:10.2f} records/s ({:.2f}x)'.format(
+                pw, count, size, workers, rate, rate / base))
+            if workers >= cores:
+                break
+            workers = min(2 * workers, cores)
+
+
+def bench_stats(count=2000, size=64):
+    # messages per second of a plain instance against an instrumented copy of it
+    for pw in [32, 64]:
+        norx = NORX(pw)
+        k, n, m = b'\x00' * (4*pw//8), b'\x00' * (2*pw//8), b'\x00' * size
+        rates = []
+        for x in [norx, norx.instrumented()]:
+            start = time()
+            for i in range(count):
+                x.aead_encrypt(b'', m, b'', n, k)
+            rates.append(count / (time() - start))
+        print('NORX{}, {} B, instrumented: {:10.2f} -> {:10.2f} messages/s ({:.2f}x)'.format(
+            pw, size, rates[0], rates[1], rates[1] / rates[0]))
+
+
+def bench_init(min_time=0.2):
+    # latency of init and of small messages with the key passed on every call against a key schedule, with the
+    # reference and the selected backend
+    from norx_backend import select
+    classes = [NORX] if select() is NORX else [NORX, select()]
+    for pw, norx in [(pw, cls(pw)) for cls in classes for pw in [32, 64]]:
+        k, n = b'\x00' * (4*pw//8), b'\x00' * (2*pw//8)
+        key = NORXKey(norx, k)
+        S = [0] * 16
+        K = norx.schedule(k)
+        before = measure(lambda: norx.init(S, n, k), min_time)
+        after = measure(lambda: norx.init_scheduled(S, n, K), min_time)
+        print('NORX{}, {} init: {:8.2f} -> {:8.2f} us ({:.2f}x)'.format(
+            pw, type(norx).__name__, before * 1e6, after * 1e6, before / after))
+        for size in [0, 64]:
+            m = b'\x00' * size
+            before = measure(lambda: norx.aead_encrypt(b'', m, b'', n, k), min_time)
+            after = measure(lambda: key.aead_encrypt(b'', m, b'', n), min_time)
+            print('NORX{}, {} {} B: {:8.2f} -> {:8.2f} us ({:.2f}x)'.format(
+                pw, type(norx).__name__, size, before * 1e6, after * 1e6, before / after))
+
+
+def bench_reject(count=200, size=1 << 10):
+    # rejections per second of forged ciphertexts, default path against verify-first decryption
+    for pw in [32, 64]:
+        norx = NORX(pw)
+        k, n = b'\x00' * (4*pw//8), b'\x00' * (2*pw//8)
+        c = bytearray(norx.aead_encrypt(b'', b'\x00' * size, b'', n, k))
+        c[-1] ^= 0x01
+        rates = []
+        for verify_first in [False, True]:
+            start = time()
+            for i in range(count):
+                assert norx.aead_decrypt(b'', c, b'', n, k, verify_first) == b''
+            rates.append(count / (time() - start))
+        print('NORX{}, forged {} B: {:10.2f} -> {:10.2f} rejections/s ({:.2f}x)'.format(
+            pw, size, rates[0], rates[1], rates[1] / rates[0]))
+
+
+def bench_backend(size=1 << 18):
+    # throughput of the selected backend against the reference implementation
+    from norx_backend import select
+    norx_class = select()
+    m = b'\x00' * size
+    for pw in [32, 64]:
+        k, n = b'\x00' * (4*pw//8), b'\x00' * (2*pw//8)
+        rates = []
+        for cls in [NORX, norx_class]:
+            norx = cls(pw)
+            start = time()
+            norx.aead_encrypt(b'', m, b'', n, k)
+            rates.append(size / (time() - start) / 1024)
+        print('NORX{}, {}: {:10.2f} -> {:10.2f} KiB/s ({:.2f}x)'.format(
+            pw, norx_class.__name__, rates[0], rates[1], rates[1] / rates[0]))
+
+
+INTERPRETER_SCRIPT = """
+from time import time
+start = time()
+from norx import NORX, NORXKey
+norx = NORX()
+imported = time() - start
+m, n, k = b'\\x00' * {size}, b'\\x00' * 16, b'\\x00' * 32
+start = time()
+norx.aead_encrypt(b'', m, b'', n, k)
+print('{{}} {{}}'.format(imported, {size} / (time() - start)))
+"""
+
+
+def bench_interpreters(interpreters=('python2', 'python3'), size=1 << 18):
+    # process startup, import time and throughput of the same code under each interpreter, the first one
+    # found is the baseline
+    base = None
+    here = os.path.dirname(os.path.abspath(__file__))
+    for interpreter in interpreters:
+        try:
+            start = time()
+            subprocess.check_call([interpreter, '-c', 'pass'], cwd=here)
+            startup = time() - start
+            out = subprocess.check_output([interpreter, '-c', INTERPRETER_SCRIPT.format(size=size)], cwd=here)
+        except (OSError, subprocess.CalledProcessError):
+            print('NORX {}: interpreter not available, benchmark skipped.'.format(interpreter))
+            continue
+        imported, rate = [float(x) for x in out.split()]
+        base = base or rate
+        print('NORX64 {}: startup {:.3f} s, import {:.3f} s, {:10.2f} KiB/s ({:.2f}x)'.format(
+            interpreter, startup, imported, rate / 1024, rate / base))
+
+
+STARTUP_SCRIPTS = [('interpreter', 'pass'),
+                   ('import norx', 'import norx'),
+                   ('first aead_encrypt', "from norx import NORX\n"
+                                          "NORX().aead_encrypt(b'', b'\\x00' * 64, b'', b'\\x00' * 16, b'\\x00' * 32)")]
+
+
+def bench_startup(repeat=10):
+    # best wall time from interpreter start to exit for a bare interpreter, the import of norx and the first
+    # aead_encrypt of a fresh process, i.e. what a CLI invocation or a short-lived worker pays up front
+    here = os.path.dirname(os.path.abspath(__file__))
+    base = None
+    for name, script in STARTUP_SCRIPTS:
+        best = None
+        for i in range(repeat):
+            start = time()
+            subprocess.check_call([sys.executable, '-c', script], cwd=here)
+            elapsed = time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        base = best if base is None else base
+        print('NORX startup, {}: {:.4f} s (+{:.4f} s)'.format(name, best, best - base))
+
+
+SIZES = [0, 64, 1 << 10, 1 << 14, 1 << 16, 1 << 20, 1 << 24]
+
+
+def configurations():
+    for pw in [32, 64]:
+        for pr in [4, 6]:
+            for pd in [1, 2, 4, 0]:
+                for pt in [2*pw, 4*pw]:
+                    yield pw, pr, pd, pt
+
+
+def measure(f, min_time=0.1, repeat=3):
+    # median seconds per call, calls are batched until a batch takes at least min_time
+    count = 1
+    while True:
+        start = time()
+        for i in range(count):
+            f()
+        if time() - start >= min_time:
+            break
+        count *= 2
+    runs = [time() - start]
+    for j in range(repeat - 1):
+        start = time()
+        for i in range(count):
+            f()
+        runs.append(time() - start)
+    return sorted(runs)[len(runs) // 2] / count
+
+
+def bench_suite(sizes=SIZES, min_time=0.1):
+    # latency and throughput of aead_encrypt/aead_decrypt and of the primitives for every configuration
+    results = {}
+    for pw, pr, pd, pt in configurations():
+        name = 'w{}/r{}/d{}/t{}'.format(pw, pr, pd, pt)
+        norx = NORX(pw, pr, pd, pt)
+        k, n = b'\x00' * (4*pw//8), b'\x00' * (2*pw//8)
+        S = [0] * 16
+        results['permute/' + name] = {'latency': measure(lambda: norx.permute(S), min_time)}
+        results['init/' + name] = {'latency': measure(lambda: norx.init(S, n, k), min_time)}
+        results['generate_tag/' + name] = {'latency': measure(lambda: norx.generate_tag(S), min_time)}
+        for size in sizes:
+            m = b'\x00' * size
+            c = norx.aead_encrypt(b'', m, b'', n, k)
+            for op, f in [('aead_encrypt', lambda: norx.aead_encrypt(b'', m, b'', n, k)),
+                          ('aead_decrypt', lambda: norx.aead_decrypt(b'', c, b'', n, k))]:
+                latency = measure(f, min_time, 1 if size >= 1 << 20 else 3)
+                results['{}/{}/{}'.format(op, name, size)] = {'latency': latency, 'throughput': size / latency}
+                print('{}/{}/{}: {:.6f} s, {:.2f} KiB/s'.format(op, name, size, latency, size / latency / 1024))
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'time': time(), 'results': results}
+
+
+def compare(old, new, threshold=0.1):
+    # keys whose latency grew by more than the threshold, as (key, old latency, new latency)
+    slower = []
+    for key in sorted(set(old['results']) & set(new['results'])):
+        a, b = old['results'][key]['latency'], new['results'][key]['latency']
+        if b > a * (1 + threshold):
+            slower.append((key, a, b))
+    return slower
+
+
+def main(argv=None):
+    parser = ArgumentParser(description='NORX benchmarks.')
+    parser.add_argument('--suite', action='store_true', help='run the full benchmark suite')
+    parser.add_argument('--json', help='write the suite results to this file')
+    parser.add_argument('--max-size', type=int, default=SIZES[-1], help='largest message size of the suite')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two JSON result files')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown that is flagged')
+    parser.add_argument('--interpreters', nargs='+', metavar='PYTHON',
+                        help='compare startup and throughput of these interpreters')
+    parser.add_argument('--startup', action='store_true', help='only measure the startup cost')
+    args = parser.parse_args(argv)
+    if args.compare:
+        old, new = [json.load(open(x)) for x in args.compare]
+        slower = compare(old, new, args.threshold)
+        for key, a, b in slower:
+            print('SLOWER {}: {:.6f} s -> {:.6f} s ({:+.1f}%)'.format(key, a, b, 100 * (b / a - 1)))
+        print('{} of {} measurements slower by more than {:.0f}%.'.format(
+            len(slower), len(set(old['results']) & set(new['results'])), 100 * args.threshold))
+        return 1 if slower else 0
+    if args.interpreters:
+        bench_interpreters(args.interpreters)
+        return 0
+    if args.startup:
+        bench_startup()
+        return 0
+    if args.suite:
+        data = bench_suite([x for x in SIZES if x <= args.max_size])
+        if args.json:
+            json.dump(data, open(args.json, 'w'), indent=1, sort_keys=True)
+        return 0
+    bench_permute()
+    bench_parallel()
+    bench_batch()
+    bench_seal_many()
+    bench_file()
+    bench_seek()
+    bench_reject()
+    bench_init()
+    bench_stats()
+    bench_backend()
+    bench_startup()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,74 +1,231 @@
 """
-   Python2 implementation of NORX.
+   Python implementation of NORX for Python 2 and 3.
    ------
 
    :author: Philipp Jovanovic <philipp@jovanovic.io>, 2014-2015.
    :license: CC0, see LICENSE for more details.
 """
 
-from struct import pack, unpack
+from struct import Struct, pack, unpack
 
+# only what aead_encrypt and aead_decrypt need is imported here, everything else (multiprocessing,
+# collections, tempfile, hmac, ...) is imported by the methods that use it to keep startup short
+
+
+_PERMUTATIONS = {}
+
+
+def permutation(w, r):
+    # build the permutation F^r for word size w as a single function that keeps the state in locals,
+    # with all rounds and G calls unrolled and the rotation constants inlined; built once per (w, r)
+    if (w, r) not in _PERMUTATIONS:
+        R = {32: (8, 11, 16, 31), 64: (8, 19, 40, 63)}[w]
+        M = hex((1 << w) - 1).rstrip('L')
+        G = ['{a} = ({a} ^ {b} ^ (({a} & {b}) << 1)) & {M}',
+             '{d} ^= {a}', '{d} = (({d} >> {R0}) | ({d} << {W0})) & {M}',
+             '{c} = ({c} ^ {d} ^ (({c} & {d}) << 1)) & {M}',
+             '{b} ^= {c}', '{b} = (({b} >> {R1}) | ({b} << {W1})) & {M}',
+             '{a} = ({a} ^ {b} ^ (({a} & {b}) << 1)) & {M}',
+             '{d} ^= {a}', '{d} = (({d} >> {R2}) | ({d} << {W2})) & {M}',
+             '{c} = ({c} ^ {d} ^ (({c} & {d}) << 1)) & {M}',
+             '{b} ^= {c}', '{b} = (({b} >> {R3}) | ({b} << {W3})) & {M}']
+        steps = [(0, 4, 8, 12), (1, 5, 9, 13), (2, 6, 10, 14), (3, 7, 11, 15),
+                 (0, 5, 10, 15), (1, 6, 11, 12), (2, 7, 8, 13), (3, 4, 9, 14)]
+        state = ', '.join('s%d' % i for i in range(16))
+        src = ['def permute(S):', '    %s = S' % state]
+        for _ in range(r):
+            for a, b, c, d in steps:
+                for l in G:
+                    src.append('    ' + l.format(a='s%d' % a, b='s%d' % b, c='s%d' % c, d='s%d' % d, M=M,
+                                                 R0=R[0], R1=R[1], R2=R[2], R3=R[3],
+                                                 W0=w-R[0], W1=w-R[1], W2=w-R[2], W3=w-R[3]))
+        src.append('    S[:] = %s' % state)
+        ns = {}
+        exec('\n'.join(src), ns)
+        _PERMUTATIONS[(w, r)] = ns['permute']
+    return _PERMUTATIONS[(w, r)]
+
+
+def _process_lanes(args):
+    # worker entry point for the process pool, must live at module level to be picklable; norx arrives as an
+    # instance of the class of the caller
+    norx, S, x, tasks, mode = args
+    y = None if mode == 'authenticate' else bytearray(len(x))
+    return norx.process_lanes(S, x, y, tasks, mode), y
+
+
+def _view(x):
+    # memoryview of x to slice it without copying, or x itself where there is none (mmap on Python 2)
+    try:
+        return memoryview(x)
+    except TypeError:
+        return x
+
+
+# lengths of the header, message, trailer, nonce and key of a packed record
+_RECORD = Struct('<LLLLL')
+_sealer = None
+
+
+def _pack_records(records):
+    # the record lengths followed by the record contents in one string, a batch is pickled as a single object
+    buf = bytearray(_RECORD.size * len(records))
+    for i, r in enumerate(records):
+        _RECORD.pack_into(buf, _RECORD.size * i, *[len(x) for x in r])
+    for r in records:
+        for x in r:
+            buf += x
+    return bytes(buf)
+
+
+def _seal_packed(norx, count, buf):
+    # encrypt the count records packed in buf into one string of concatenated ciphertexts
+    x = memoryview(buf)
+    lengths = [_RECORD.unpack_from(buf, _RECORD.size * i) for i in range(count)]
+    out = bytearray(sum(l[1] for l in lengths) + count * norx.BYTES_TAG)
+    y = memoryview(out)
+    i, j = _RECORD.size * count, 0
+    for lh, lm, lt, ln, lk in lengths:
+        a = i + lh
+        b = a + lm
+        c = b + lt
+        d = c + ln
+        j += norx.encrypt_into(y[j:], x[i:a], x[a:b], x[b:c], buf[c:d], buf[d:d+lk])
+        i = d + lk
+    return bytes(out)
 
-class NORX(object):
 
-    def __init__(self, w=64, r=4, d=1, t=256):
+def _init_sealer(cls, params):
+    # pool initializer, every worker keeps one instance for all of its batches
+    global _sealer
+    _sealer = cls(*params)
+
+
+def _seal_batch(args):
+    count, buf = args
+    return _seal_packed(_sealer, count, buf)
+
+
+_PARAMETERS = {}
+
+
+def parameters(w, r, d, t):
+    # interned parameter object of the configuration (w, r, d, t)
+    if (w, r, d, t) not in _PARAMETERS:
+        _PARAMETERS[(w, r, d, t)] = Parameters(w, r, d, t)
+    return _PARAMETERS[(w, r, d, t)]
+
+
+class Parameters(object):
+    # immutable constants derived from (w, r, d, t), shared by all NORX instances of that configuration
+
+    __slots__ = ('NORX_W', 'NORX_R', 'NORX_D', 'NORX_T', 'NORX_N', 'NORX_K', 'NORX_B', 'NORX_C', 'RATE',
+                 'HEADER_TAG', 'PAYLOAD_TAG', 'TRAILER_TAG', 'FINAL_TAG', 'BRANCH_TAG', 'MERGE_TAG',
+                 'BYTES_WORD', 'BYTES_TAG', 'WORDS_RATE', 'BYTES_RATE', 'WORDS_TAG', 'R', 'U', 'M', 'fmt',
+                 'BLOCK', 'TAG', 'KEY', 'NONCE', 'INIT', 'permute')
+
+    def __init__(self, w, r, d, t):
         assert w in [32, 64]
         assert r >= 1
         assert d >= 0
         assert 10 * w >= t >= 0
-        self.NORX_W = w
-        self.NORX_R = r
-        self.NORX_D = d
-        self.NORX_T = t
-        self.NORX_N = w * 2
-        self.NORX_K = w * 4
-        self.NORX_B = w * 16
-        self.NORX_C = w * 6
-        self.RATE = self.NORX_B - self.NORX_C
-        self.HEADER_TAG = 1 << 0
-        self.PAYLOAD_TAG = 1 << 1
-        self.TRAILER_TAG = 1 << 2
-        self.FINAL_TAG = 1 << 3
-        self.BRANCH_TAG = 1 << 4
-        self.MERGE_TAG = 1 << 5
-        self.BYTES_WORD = w / 8
-        self.BYTES_TAG = t / 8
-        self.WORDS_RATE = self.RATE / w
-        self.BYTES_RATE = self.WORDS_RATE * self.BYTES_WORD
+        x = {}
+        x['NORX_W'] = w
+        x['NORX_R'] = r
+        x['NORX_D'] = d
+        x['NORX_T'] = t
+        x['NORX_N'] = w * 2
+        x['NORX_K'] = w * 4
+        x['NORX_B'] = w * 16
+        x['NORX_C'] = w * 6
+        x['RATE'] = x['NORX_B'] - x['NORX_C']
+        x['HEADER_TAG'] = 1 << 0
+        x['PAYLOAD_TAG'] = 1 << 1
+        x['TRAILER_TAG'] = 1 << 2
+        x['FINAL_TAG'] = 1 << 3
+        x['BRANCH_TAG'] = 1 << 4
+        x['MERGE_TAG'] = 1 << 5
+        x['BYTES_WORD'] = w // 8
+        x['BYTES_TAG'] = t // 8
+        x['WORDS_RATE'] = x['RATE'] // w
+        x['BYTES_RATE'] = x['WORDS_RATE'] * x['BYTES_WORD']
+        x['WORDS_TAG'] = (x['BYTES_TAG'] + x['BYTES_WORD'] - 1) // x['BYTES_WORD']
         if w == 32:
-            self.R = (8, 11, 16, 31)
-            self.U = (0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344, 0x254F537A,
+            x['R'] = (8, 11, 16, 31)
+            x['U'] = (0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344, 0x254F537A,
                       0x38531D48, 0x839C6E83, 0xF97A3AE5, 0x8C91D88C, 0x11EAFB59)
-            self.M = 0xffffffff
-            self.fmt = '<L'
+            x['M'] = 0xffffffff
+            x['fmt'] = '<L'
         elif w == 64:
-            self.R = (8, 19, 40, 63)
-            self.U = (0x243F6A8885A308D3, 0x13198A2E03707344, 0xA4093822299F31D0, 0x082EFA98EC4E6C89, 0xAE8858DC339325A1,
+            x['R'] = (8, 19, 40, 63)
+            x['U'] = (0x243F6A8885A308D3, 0x13198A2E03707344, 0xA4093822299F31D0, 0x082EFA98EC4E6C89, 0xAE8858DC339325A1,
                       0x670A134EE52D7FA6, 0xC4316D80CD967541, 0xD21DFBF8B630B762, 0x375A18D261E7F892, 0x343D1F187D92285B)
-            self.M = 0xffffffffffffffff
-            self.fmt = '<Q'
+            x['M'] = 0xffffffffffffffff
+            x['fmt'] = '<Q'
+        x['BLOCK'] = Struct('<' + x['fmt'][1] * x['WORDS_RATE'])
+        x['TAG'] = Struct('<' + x['fmt'][1] * x['WORDS_TAG'])
+        x['KEY'] = Struct('<' + x['fmt'][1] * 4)
+        x['NONCE'] = Struct('<' + x['fmt'][1] * 2)
+        # init state with zero key and nonce words, the parameter words are folded into S[12..15]
+        U = x['U']
+        x['INIT'] = (U[0], 0, 0, U[1], 0, 0, 0, 0, U[2], U[3], U[4], U[5],
+                     U[6] ^ w, U[7] ^ r, U[8] ^ d, U[9] ^ t)
+        x['permute'] = permutation(w, r)
+        for name, value in x.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('NORX parameters are immutable')
+
+
+class NORX(object):
+
+    __slots__ = ('P', 'WORKERS', 'PARALLEL_THRESHOLD', 'POOL')
+
+    def __init__(self, w=64, r=4, d=1, t=256, workers=1, pool=None):
+        # pool is a long-lived multiprocessing pool or executor with a map method that parallel lanes are
+        # distributed on, see process_data_parallel
+        assert workers >= 1
+        self.P = parameters(w, r, d, t)
+        self.WORKERS = workers
+        self.PARALLEL_THRESHOLD = 1 << 16
+        self.POOL = pool
+
+    def __getattr__(self, name):
+        # constants such as NORX_W or BYTES_RATE are read from the parameter object
+        if name == 'P':
+            raise AttributeError(name)
+        return getattr(self.P, name)
+
+    def __reduce__(self):
+        # the parameter object holds Struct codecs and generated code, neither of which pickle, so an instance is
+        # rebuilt from its configuration; the pool stays with the original
+        P = self.P
+        return (type(self), (P.NORX_W, P.NORX_R, P.NORX_D, P.NORX_T, self.WORKERS),
+                (None, {'PARALLEL_THRESHOLD': self.PARALLEL_THRESHOLD}))
 
     def load(self, x):
-        return unpack(self.fmt, x)[0]
+        return unpack(self.P.fmt, x)[0]
 
     def store(self, x):
-        return pack(self.fmt, x)
+        return pack(self.P.fmt, x)
 
     def ROTR(self, a, r):
-        return ((a >> r) | (a << (self.NORX_W - r))) & self.M
+        return ((a >> r) | (a << (self.P.NORX_W - r))) & self.P.M
 
     def H(self, a, b):
-        return ((a ^ b) ^ ((a & b) << 1)) & self.M
+        return ((a ^ b) ^ ((a & b) << 1)) & self.P.M
 
     def G(self, a, b, c, d):
+        R = self.P.R
         a = self.H(a, b)
-        d = self.ROTR(a ^ d, self.R[0])
+        d = self.ROTR(a ^ d, R[0])
         c = self.H(c, d)
-        b = self.ROTR(b ^ c, self.R[1])
+        b = self.ROTR(b ^ c, R[1])
         a = self.H(a, b)
-        d = self.ROTR(a ^ d, self.R[2])
+        d = self.ROTR(a ^ d, R[2])
         c = self.H(c, d)
-        b = self.ROTR(b ^ c, self.R[3])
+        b = self.ROTR(b ^ c, R[3])
         return a, b, c, d
 
     def F(self, S):
@@ -83,170 +240,577 @@ class NORX(object):
         S[2], S[7], S[8], S[13] = self.G(S[2], S[7], S[8], S[13])
         S[3], S[4], S[9], S[14] = self.G(S[3], S[4], S[9], S[14])
 
-    def permute(self, S):
-        for i in xrange(self.NORX_R):
-            self.F(S)
-
     def pad(self, x):
-        y = bytearray(self.BYTES_RATE)
+        n = self.P.BYTES_RATE
+        y = bytearray(n)
         y[:len(x)] = x
         y[len(x)] = 0x01
-        y[self.BYTES_RATE-1] |= 0x80
+        y[n-1] |= 0x80
         return y
 
     def init(self, S, n, k):
-        b = self.BYTES_WORD
-        K = [self.load(k[b*i:b*(i+1)]) for i in xrange(self.NORX_K / self.NORX_W)]
-        N = [self.load(n[b*i:b*(i+1)]) for i in xrange(self.NORX_N / self.NORX_W)]
-        U = self.U
-        S[0], S[1], S[2], S[3] = U[0], N[0], N[1], U[1]
-        S[4], S[5], S[6], S[7] = K[0], K[1], K[2], K[3]
-        S[8], S[9], S[10], S[11] = U[2], U[3], U[4], U[5]
-        S[12], S[13], S[14], S[15] = U[6], U[7], U[8], U[9]
-        S[12] ^= self.NORX_W
-        S[13] ^= self.NORX_R
-        S[14] ^= self.NORX_D
-        S[15] ^= self.NORX_T
-        self.permute(S)
+        P = self.P
+        S[:] = P.INIT
+        S[1], S[2] = P.NONCE.unpack_from(n)
+        S[4], S[5], S[6], S[7] = P.KEY.unpack_from(k)
+        P.permute(S)
+
+    def schedule(self, k):
+        # init template with the key words loaded, see init_scheduled and NORXKey
+        P = self.P
+        assert len(k) == P.NORX_K // 8
+        K = list(P.INIT)
+        K[4], K[5], K[6], K[7] = P.KEY.unpack_from(k)
+        return tuple(K)
+
+    def init_scheduled(self, S, n, K):
+        P = self.P
+        S[:] = K
+        S[1], S[2] = P.NONCE.unpack_from(n)
+        P.permute(S)
 
     def inject_tag(self, S, tag):
         S[15] ^= tag
 
     def process_header(self, S, x):
-        return self.absorb_data(S, x, self.HEADER_TAG)
+        return self.absorb_data(S, x, self.P.HEADER_TAG)
 
     def process_trailer(self, S, x):
-        return self.absorb_data(S, x, self.TRAILER_TAG)
+        return self.absorb_data(S, x, self.P.TRAILER_TAG)
 
     def absorb_data(self, S, x, tag):
         inlen = len(x)
         if inlen > 0:
-            i, n = 0, self.BYTES_RATE
-            while inlen >= n:
-                self.absorb_block(S, x[n*i:n*(i+1)], tag)
-                inlen -= n
-                i += 1
-            self.absorb_lastblock(S, x[n*i:n*i+inlen], tag)
-
-    def absorb_block(self, S, x, tag):
-        b = self.BYTES_WORD
-        self.inject_tag(S, tag)
-        self.permute(S)
-        for i in xrange(self.WORDS_RATE):
-            S[i] ^= self.load(x[b*i:b*(i+1)])
+            i, n = 0, self.P.BYTES_RATE
+            absorb_block = self.absorb_block
+            while inlen - i >= n:
+                absorb_block(S, x, tag, i)
+                i += n
+            self.absorb_lastblock(S, x[i:inlen], tag)
+
+    def absorb_block(self, S, x, tag, i=0):
+        P = self.P
+        S[15] ^= tag
+        P.permute(S)
+        for j, w in enumerate(P.BLOCK.unpack_from(x, i)):
+            S[j] ^= w
 
     def absorb_lastblock(self, S, x, tag):
         y = self.pad(x)
         self.absorb_block(S, y, tag)
 
-    def encrypt_data(self, S, x):
-        c = bytearray()
-        inlen = len(x)
+    def branch(self, S, lane):
+        P = self.P
+        S[15] ^= P.BRANCH_TAG
+        P.permute(S)
+        for i in range(P.WORDS_RATE):
+            S[i] ^= lane
+
+    def merge(self, S, S1):
+        P = self.P
+        S1[15] ^= P.MERGE_TAG
+        P.permute(S1)
+        for i in range(16):
+            S[i] ^= S1[i]
+
+    def process_lanes(self, S, x, y, tasks, mode):
+        # branch the lanes, process their blocks of x into the same offsets of y and merge them, returns the sum
+        # of the merged states; a task (lane, offsets, last) lists the offsets of the blocks of a lane, the final
+        # one of which holds only last bytes unless last is None. mode is 'encrypt', 'decrypt' or 'authenticate',
+        # which only updates the state like 'decrypt' and leaves y alone
+        if mode == 'authenticate':
+            authenticate_block, authenticate_lastblock = self.authenticate_block, self.authenticate_lastblock
+            process_block = lambda S, x, i, y, j: authenticate_block(S, x, i)
+            process_lastblock = lambda S, x, y, j: authenticate_lastblock(S, x)
+        else:
+            process_block, process_lastblock = getattr(self, mode + '_block'), getattr(self, mode + '_lastblock')
+        T = [0] * 16
+        for lane, offsets, last in tasks:
+            L = list(S)
+            self.branch(L, lane)
+            for i in (offsets if last is None else offsets[:-1]):
+                process_block(L, x, i, y, i)
+            if last is not None:
+                i = offsets[-1]
+                process_lastblock(L, x[i:i+last], y, i)
+            self.merge(T, L)
+        return T
+
+    def process_data_parallel(self, S, x, y, inlen, mode):
+        # block j of the payload is processed on lane j mod D, or on its own lane j if D = 0. The lanes run on x
+        # and y in place, or from PARALLEL_THRESHOLD bytes on with WORKERS > 1 on POOL (a pool for this call if
+        # it is None), where each worker is sent one copy of the blocks of its lanes
+        P = self.P
         if inlen > 0:
-            i, n = 0, self.BYTES_RATE
-            while inlen >= n:
-                c += self.encrypt_block(S, x[n*i:n*(i+1)])
-                inlen -= n
-                i += 1
-            c += self.encrypt_lastblock(S, x[n*i:n*i+inlen])
-        return c
-
-    def encrypt_block(self, S, x):
-        c = bytearray()
-        b = self.BYTES_WORD
-        self.inject_tag(S, self.PAYLOAD_TAG)
-        self.permute(S)
-        for i in xrange(self.WORDS_RATE):
-            S[i] ^= self.load(x[b*i:b*(i+1)])
-            c += self.store(S[i])
-        return c[:self.BYTES_RATE]
-
-    def encrypt_lastblock(self, S, x):
-        y = self.pad(x)
-        c = self.encrypt_block(S, y)
-        return c[:len(x)]
+            n = P.BYTES_RATE
+            blocks = inlen // n + 1
+            lanes = P.NORX_D if P.NORX_D > 1 else blocks
+            final, last = (blocks - 1) % lanes, inlen % n
+            workers = min(self.WORKERS, lanes)
+            if workers < 2 or inlen < self.PARALLEL_THRESHOLD:
+                tasks = [(lane, range(n*lane, n*blocks, n*lanes), last if lane == final else None)
+                         for lane in range(lanes)]
+                S[:] = self.process_lanes(S, x, y, tasks, mode)
+                return y
+            X, groups, args = _view(x), [], []
+            for g in range(workers):
+                group = [range(lane, blocks, lanes) for lane in range(g, lanes, workers)]
+                z = bytearray(sum(n * len(js) for js in group) - (n - last if final % workers == g else 0))
+                tasks, i = [], 0
+                for lane, js in zip(range(g, lanes, workers), group):
+                    tasks.append((lane, range(i, i + n*len(js), n), last if lane == final else None))
+                    for j in js:
+                        l = min(n, inlen - n*j)
+                        z[i:i+l] = X[n*j:n*j+l]
+                        i += l
+                groups.append(group)
+                args.append((self, S, z, tasks, mode))
+            pool = self.POOL
+            if pool is None:
+                from multiprocessing import Pool
+                pool = Pool(workers)
+            try:
+                results = list(pool.map(_process_lanes, args))
+            finally:
+                if pool is not self.POOL:
+                    pool.close()
+                    pool.join()
+            Y = _view(y)
+            S[:] = [0] * 16
+            for group, (T, out) in zip(groups, results):
+                for i in range(16):
+                    S[i] ^= T[i]
+                if out is None:
+                    continue
+                # mmap on Python 2 only takes str
+                out, i = _view(out) if Y is not y else bytes(out), 0
+                for js in group:
+                    for j in js:
+                        l = min(n, inlen - n*j)
+                        Y[n*j:n*j+l] = out[i:i+l]
+                        i += l
+        return y
 
-    def decrypt_data(self, S, x):
-        m = bytearray()
-        inlen = len(x)
+    def encrypt_data(self, S, x, y=None, inlen=None):
+        # encrypt the first inlen bytes of the buffer x into the buffer y, both at offset 0
+        inlen = len(x) if inlen is None else inlen
+        y = bytearray(inlen) if y is None else y
+        if self.P.NORX_D != 1:
+            return self.process_data_parallel(S, x, y, inlen, 'encrypt')
         if inlen > 0:
-            i, n = 0, self.BYTES_RATE
-            while inlen >= n:
-                m += self.decrypt_block(S, x[n*i:n*(i+1)])
-                inlen -= n
-                i += 1
-            m += self.decrypt_lastblock(S, x[n*i:n*i+inlen])
-        return m
+            i, n = 0, self.P.BYTES_RATE
+            encrypt_block = self.encrypt_block
+            while inlen - i >= n:
+                encrypt_block(S, x, i, y, i)
+                i += n
+            self.encrypt_lastblock(S, x[i:inlen], y, i)
+        return y
 
-    def decrypt_block(self, S, x):
-        m = bytearray()
-        b = self.BYTES_WORD
-        self.inject_tag(S, self.PAYLOAD_TAG)
-        self.permute(S)
-        for i in xrange(self.WORDS_RATE):
-            c = self.load(x[b*i:b*(i+1)])
-            m += self.store(S[i] ^ c)
-            S[i] = c
-        return m[:self.BYTES_RATE]
-
-    def decrypt_lastblock(self, S, x):
-        m = bytearray()
-        y = bytearray()
-        b = self.BYTES_WORD
-        self.inject_tag(S, self.PAYLOAD_TAG)
-        self.permute(S)
-        for i in xrange(self.WORDS_RATE):
-            y += self.store(S[i])
-        y[:len(x)] = bytearray(x)
-        y[len(x)] ^= 0x01
-        y[self.BYTES_RATE-1] ^= 0x80
-        for i in xrange(self.WORDS_RATE):
-            c = self.load(y[b*i:b*(i+1)])
-            m += self.store(S[i] ^ c)
-            S[i] = c
-        return m[:len(x)]
+    def encrypt_block(self, S, x, i=0, y=None, j=0):
+        # encrypt the block of x at offset i into y at offset j
+        P = self.P
+        y = bytearray(P.BYTES_RATE) if y is None else y
+        S[15] ^= P.PAYLOAD_TAG
+        P.permute(S)
+        for k, w in enumerate(P.BLOCK.unpack_from(x, i)):
+            S[k] ^= w
+        P.BLOCK.pack_into(y, j, *S[:P.WORDS_RATE])
+        return y
+
+    def encrypt_lastblock(self, S, x, y=None, j=0):
+        c = self.encrypt_block(S, self.pad(x))
+        if y is None:
+            return c[:len(x)]
+        y[j:j+len(x)] = bytes(c[:len(x)])
+        return y
+
+    def decrypt_data(self, S, x, y=None, inlen=None):
+        # decrypt the first inlen bytes of the buffer x into the buffer y, both at offset 0
+        inlen = len(x) if inlen is None else inlen
+        y = bytearray(inlen) if y is None else y
+        if self.P.NORX_D != 1:
+            return self.process_data_parallel(S, x, y, inlen, 'decrypt')
+        if inlen > 0:
+            i, n = 0, self.P.BYTES_RATE
+            decrypt_block = self.decrypt_block
+            while inlen - i >= n:
+                decrypt_block(S, x, i, y, i)
+                i += n
+            self.decrypt_lastblock(S, x[i:inlen], y, i)
+        return y
+
+    def decrypt_block(self, S, x, i=0, y=None, j=0):
+        # decrypt the block of x at offset i into y at offset j
+        P = self.P
+        y = bytearray(P.BYTES_RATE) if y is None else y
+        S[15] ^= P.PAYLOAD_TAG
+        P.permute(S)
+        C = P.BLOCK.unpack_from(x, i)
+        P.BLOCK.pack_into(y, j, *[S[k] ^ C[k] for k in range(P.WORDS_RATE)])
+        S[:P.WORDS_RATE] = C
+        return y
+
+    def decrypt_lastblock(self, S, x, y=None, j=0):
+        P = self.P
+        S[15] ^= P.PAYLOAD_TAG
+        P.permute(S)
+        z = bytearray(P.BLOCK.pack(*S[:P.WORDS_RATE]))
+        z[:len(x)] = x
+        z[len(x)] ^= 0x01
+        z[P.BYTES_RATE-1] ^= 0x80
+        C = P.BLOCK.unpack_from(z)
+        m = bytearray(P.BLOCK.pack(*[S[k] ^ C[k] for k in range(P.WORDS_RATE)]))
+        S[:P.WORDS_RATE] = C
+        if y is None:
+            return m[:len(x)]
+        y[j:j+len(x)] = bytes(m[:len(x)])
+        return y
+
+    def authenticate_data(self, S, x, inlen=None):
+        # state update of decrypt_data for the first inlen bytes of x without producing any plaintext, also on
+        # parallel lanes
+        inlen = len(x) if inlen is None else inlen
+        if self.P.NORX_D != 1:
+            self.process_data_parallel(S, x, None, inlen, 'authenticate')
+        elif inlen > 0:
+            i, n = 0, self.P.BYTES_RATE
+            authenticate_block = self.authenticate_block
+            while inlen - i >= n:
+                authenticate_block(S, x, i)
+                i += n
+            self.authenticate_lastblock(S, x[i:inlen])
+
+    def authenticate_block(self, S, x, i=0):
+        P = self.P
+        S[15] ^= P.PAYLOAD_TAG
+        P.permute(S)
+        S[:P.WORDS_RATE] = P.BLOCK.unpack_from(x, i)
+
+    def authenticate_lastblock(self, S, x):
+        P = self.P
+        S[15] ^= P.PAYLOAD_TAG
+        P.permute(S)
+        z = bytearray(P.BLOCK.pack(*S[:P.WORDS_RATE]))
+        z[:len(x)] = x
+        z[len(x)] ^= 0x01
+        z[P.BYTES_RATE-1] ^= 0x80
+        S[:P.WORDS_RATE] = P.BLOCK.unpack_from(z)
 
     def generate_tag(self, S):
-        t = bytearray()
-        self.inject_tag(S, self.FINAL_TAG)
-        self.permute(S)
-        self.permute(S)
-        for i in xrange(self.WORDS_RATE):
-            t += self.store(S[i])
-        return t[:self.BYTES_TAG]
+        P = self.P
+        S[15] ^= P.FINAL_TAG
+        P.permute(S)
+        P.permute(S)
+        return bytearray(P.TAG.pack(*S[:P.WORDS_TAG]))[:P.BYTES_TAG]
 
     def verify_tag(self, t0, t1):
-        acc = 0
-        for i in xrange(self.BYTES_TAG):
-            acc |= t0[i] ^ t1[i]
-        return (((acc - 1) >> 8) & 1) - 1
+        # 0 if the tags are equal and -1 otherwise, compared in constant time
+        from hmac import compare_digest
+        return 0 if compare_digest(bytes(bytearray(t0)), bytes(bytearray(t1))) else -1
+
+    def encrypt_into(self, out, h, m, t, n, k):
+        # write ciphertext and tag into the writable buffer out, returns the number of bytes written
+        P = self.P
+        assert len(k) == P.NORX_K // 8
+        assert len(n) == P.NORX_N // 8
+        assert len(out) >= len(m) + P.BYTES_TAG
+        S = [0] * 16
+        self.init(S, n, k)
+        self.absorb_data(S, h, P.HEADER_TAG)
+        return self.encrypt_payload(S, out, m, t)
+
+    def encrypt_payload(self, S, out, m, t):
+        # encrypt m with trailer t from the state after the header into out, returns the number of bytes written
+        P = self.P
+        self.encrypt_data(S, m, out, len(m))
+        self.absorb_data(S, t, P.TRAILER_TAG)
+        out[len(m):len(m)+P.BYTES_TAG] = bytes(self.generate_tag(S))
+        return len(m) + P.BYTES_TAG
 
     def aead_encrypt(self, h, m, t, n, k):
-        assert len(k) == self.NORX_K / 8
-        assert len(n) == self.NORX_N / 8
-        c = bytearray()
+        c = bytearray(len(m) + self.P.BYTES_TAG)
+        self.encrypt_into(c, h, m, t, n, k)
+        return bytes(c)
+
+    def aead_decrypt(self, h, c, t, n, k, verify_first=False):
+        P = self.P
+        assert len(k) == P.NORX_K // 8
+        assert len(n) == P.NORX_N // 8
+        assert len(c) >= P.BYTES_TAG
         S = [0] * 16
         self.init(S, n, k)
         self.process_header(S, h)
-        c += self.encrypt_data(S, m)
+        return self.decrypt_payload(S, c, t, verify_first)
+
+    def decrypt_payload(self, S, c, t, verify_first=False):
+        # decrypt ciphertext and tag c with trailer t from the state after the header, returns b'' on failure;
+        # with verify_first, the tag is checked in a pass without plaintext and only a valid c is decrypted,
+        # which makes forgeries cheaper to reject at the price of a second pass over valid messages
+        d = len(c)-self.P.BYTES_TAG
+        t0 = c[d:]
+        if verify_first:
+            T = list(S)
+            self.authenticate_data(T, c, d)
+            self.process_trailer(T, t)
+            if self.verify_tag(t0, self.generate_tag(T)) != 0:
+                return b''
+            return bytes(self.decrypt_data(S, c, None, d))
+        m = self.decrypt_data(S, c, None, d)
         self.process_trailer(S, t)
-        c += self.generate_tag(S)
-        return str(c)
+        if self.verify_tag(t0, self.generate_tag(S)) != 0:
+            return b''
+        return bytes(m)
 
-    def aead_decrypt(self, h, c, t, n, k):
-        assert len(k) == self.NORX_K / 8
-        assert len(n) == self.NORX_N / 8
-        assert len(c) >= self.BYTES_TAG
+    def instrumented(self, stats=None):
+        # copy of this instance that records per-phase counters and timings into stats, see norx_stats
+        import norx_stats
+        return norx_stats.instrument(self, stats)
+
+    def seal_many(self, records, workers=None, chunksize=256):
+        # generator of aead_encrypt(h, m, t, n, k) for an iterable of (h, m, t, n, k) records in input order;
+        # batches of chunksize records are sealed on a pool of workers, at most two batches per worker in flight
+        from collections import deque
+        from itertools import islice
+        from multiprocessing import Pool, cpu_count
+        workers = cpu_count() if workers is None else workers
+        assert workers >= 1 and chunksize >= 1
+        if workers == 1:
+            for r in records:
+                yield self.aead_encrypt(*r)
+            return
+        P = self.P
+        params = (P.NORX_W, P.NORX_R, P.NORX_D, P.NORX_T)
+        pool = Pool(workers, _init_sealer, (type(self), params))
+        try:
+            pending = deque()
+            records = iter(records)
+            while True:
+                batch = list(islice(records, chunksize))
+                if batch:
+                    task = pool.apply_async(_seal_batch, ((len(batch), _pack_records(batch)),))
+                    pending.append(([len(r[1]) + P.BYTES_TAG for r in batch], task))
+                    if len(pending) < 2 * workers:
+                        continue
+                elif not pending:
+                    break
+                lengths, task = pending.popleft()
+                c, j = task.get(), 0
+                for l in lengths:
+                    yield c[j:j+l]
+                    j += l
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def aead_encrypt_batch(self, h, m, t, n, k):
+        # encrypt the lists of headers, messages, trailers, nonces and keys in one vectorised pass
+        if self.P.NORX_D != 1:
+            return [self.aead_encrypt(*x) for x in zip(h, m, t, n, k)]
+        import norx_batch
+        return norx_batch.aead_encrypt(self, h, m, t, n, k)
+
+    def aead_decrypt_batch(self, h, c, t, n, k):
+        if self.P.NORX_D != 1:
+            return [self.aead_decrypt(*x) for x in zip(h, c, t, n, k)]
+        import norx_batch
+        return norx_batch.aead_decrypt(self, h, c, t, n, k)
+
+
+class NORXStream(object):
+    # incremental processing of header, payload and trailer, buffering at most one partial rate block
+
+    HEADER, PAYLOAD, TRAILER, FINAL = range(4)
+
+    def __init__(self, norx, n, k):
+        assert len(k) == norx.NORX_K // 8
+        assert len(n) == norx.NORX_N // 8
+        self.norx = norx
+        self.S = [0] * 16
+        norx.init(self.S, n, k)
+        self.phase = self.HEADER
+        self.buf = bytearray()
+        self.inlen = 0
+        self.blocks = 0
+        self.lanes = None
+        self.out = bytearray()
+
+    def split(self, x, keep=0):
+        # yield all full blocks of buf + x except for the last keep bytes, which stay buffered
+        n = self.norx.BYTES_RATE
+        data = self.buf + bytearray(x)
+        self.inlen += len(x)
+        i = 0
+        while len(data) - i - keep >= n:
+            yield data[i:i+n]
+            i += n
+        self.buf = data[i:]
+
+    def enter(self, phase):
+        assert phase >= self.phase
+        if self.phase < self.PAYLOAD < phase:
+            self.enter(self.PAYLOAD)
+        if self.phase != phase:
+            if self.phase == self.HEADER and self.inlen > 0:
+                self.norx.absorb_lastblock(self.S, self.buf, self.norx.HEADER_TAG)
+            elif self.phase == self.PAYLOAD:
+                self.out = self.close_payload()
+            elif self.phase == self.TRAILER and self.inlen > 0:
+                self.norx.absorb_lastblock(self.S, self.buf, self.norx.TRAILER_TAG)
+            self.phase = phase
+            self.buf = bytearray()
+            self.inlen = 0
+
+    def update_header(self, x):
+        self.enter(self.HEADER)
+        for y in self.split(x):
+            self.norx.absorb_block(self.S, y, self.norx.HEADER_TAG)
+
+    def update_trailer(self, x):
+        self.enter(self.TRAILER)
+        for y in self.split(x):
+            self.norx.absorb_block(self.S, y, self.norx.TRAILER_TAG)
+
+    def lane(self):
+        # state that processes the next payload block, see NORX.process_data_parallel
+        norx = self.norx
+        if norx.NORX_D == 1:
+            return self.S
+        if self.lanes is None:
+            if norx.NORX_D > 1:
+                self.lanes = [list(self.S) for i in range(norx.NORX_D)]
+                for i in range(norx.NORX_D):
+                    norx.branch(self.lanes[i], i)
+            else:
+                self.lanes = [0] * 16
+        if norx.NORX_D > 1:
+            return self.lanes[self.blocks % norx.NORX_D]
+        L = list(self.S)
+        norx.branch(L, self.blocks)
+        return L
+
+    def payload_block(self, x, process):
+        L = self.lane()
+        y = process(L, x)
+        if self.norx.NORX_D == 0:
+            self.norx.merge(self.lanes, L)
+        self.blocks += 1
+        return y
+
+    def payload_lastblock(self, x, process):
+        y = self.payload_block(x, process)
+        if self.norx.NORX_D > 1:
+            T = [0] * 16
+            for L in self.lanes:
+                self.norx.merge(T, L)
+            self.S[:] = T
+        elif self.norx.NORX_D == 0:
+            self.S[:] = self.lanes
+        return y
+
+
+class NORXEncryptor(NORXStream):
+
+    def update(self, x):
+        self.enter(self.PAYLOAD)
+        c = bytearray()
+        for y in self.split(x):
+            c += self.payload_block(y, self.norx.encrypt_block)
+        return bytes(c)
+
+    def close_payload(self):
+        if self.inlen > 0:
+            return self.payload_lastblock(self.buf, self.norx.encrypt_lastblock)
+        return bytearray()
+
+    def finalize(self):
+        self.enter(self.FINAL)
+        return bytes(self.out + self.norx.generate_tag(self.S))
+
+
+class NORXDecryptor(NORXStream):
+    # the last BYTES_TAG bytes passed to update are the tag; if a sink is given, plaintext is
+    # held back in a spooled temporary file and only written to the sink once the tag verified
+
+    def __init__(self, norx, n, k, sink=None):
+        NORXStream.__init__(self, norx, n, k)
+        self.sink = sink
+        self.spool = None
+        if sink is not None:
+            from tempfile import SpooledTemporaryFile
+            self.spool = SpooledTemporaryFile(max_size=1 << 20)
+        self.tag = bytearray()
+
+    def release(self, m):
+        if self.spool is None:
+            return bytes(m)
+        self.spool.write(m)
+        return b''
+
+    def update(self, x):
+        self.enter(self.PAYLOAD)
         m = bytearray()
-        c = bytearray(c)
+        for y in self.split(x, self.norx.BYTES_TAG):
+            m += self.payload_block(y, self.norx.decrypt_block)
+        return self.release(m)
+
+    def close_payload(self):
+        b = self.norx.BYTES_TAG
+        assert len(self.buf) >= b
+        d = len(self.buf) - b
+        self.buf, self.tag = self.buf[:d], self.buf[d:]
+        if self.inlen > b:
+            return self.payload_lastblock(self.buf, self.norx.decrypt_lastblock)
+        return bytearray()
+
+    def finalize(self):
+        self.enter(self.FINAL)
+        if self.norx.verify_tag(self.tag, self.norx.generate_tag(self.S)) != 0:
+            if self.spool is not None:
+                self.spool.close()
+            raise ValueError('NORX: tag verification failed')
+        m = self.release(self.out)
+        if self.spool is not None:
+            from shutil import copyfileobj
+            self.spool.seek(0)
+            copyfileobj(self.spool, self.sink)
+            self.spool.close()
+        return m
+
+
+class NORXKey(object):
+    # fixed key whose words are loaded into the init template once, for use with any number of nonces
+
+    __slots__ = ('norx', 'K')
+
+    def __init__(self, norx, k):
+        self.norx = norx
+        self.K = norx.schedule(k)
+
+    def state(self, h, n):
+        # state after init and header; constants are read from the parameter object as in NORX.encrypt_into,
+        # since attribute lookups through NORX.__getattr__ would cost more than the key schedule saves
+        norx = self.norx
+        P = norx.P
+        assert len(n) == P.NORX_N // 8
         S = [0] * 16
-        d = len(c)-self.BYTES_TAG
-        c, t0 = c[:d], c[d:]
-        self.init(S, n, k)
-        self.process_header(S, h)
-        m += self.decrypt_data(S, c)
-        self.process_trailer(S, t)
-        t1 = self.generate_tag(S)
-        if self.verify_tag(t0, t1) != 0:
-            m = ''
-        return str(m)
+        norx.init_scheduled(S, n, self.K)
+        norx.absorb_data(S, h, P.HEADER_TAG)
+        return S
+
+    def encrypt_into(self, out, h, m, t, n):
+        assert len(out) >= len(m) + self.norx.P.BYTES_TAG
+        return self.norx.encrypt_payload(self.state(h, n), out, m, t)
+
+    def aead_encrypt(self, h, m, t, n):
+        c = bytearray(len(m) + self.norx.P.BYTES_TAG)
+        self.norx.encrypt_payload(self.state(h, n), c, m, t)
+        return bytes(c)
+
+    def aead_decrypt(self, h, c, t, n, verify_first=False):
+        assert len(c) >= self.norx.P.BYTES_TAG
+        return self.norx.decrypt_payload(self.state(h, n), c, t, verify_first)
+
+if __name__ == '__main__':
+    import sys
+    from norx_file import main
+    sys.exit(main())
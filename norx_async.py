@@ -0,0 +1,182 @@
+"""
+   asyncio service layer for NORX (Python 3).
+   ------
+
+   Messages below a size threshold are processed inline on the event loop.
+   Larger ones are handed to a thread or process executor, or, without an
+   executor, streamed through NORXEncryptor/NORXDecryptor in slices with a
+   yield to the loop after every slice. At most max_pending messages are
+   offloaded at a time, further callers wait for a free slot.
+
+   Running this module starts a local echo server that encrypts every
+   request and drives it with concurrent clients to report latencies.
+
+   :license: CC0, see LICENSE for more details.
+"""
+
+import asyncio
+import os
+import struct
+import sys
+import time
+
+from norx import NORXDecryptor, NORXEncryptor
+from norx_backend import select
+
+
+INLINE_THRESHOLD = 1 << 12
+STREAM_SLICE = 1 << 14
+FRAME = struct.Struct('>I')
+
+
+def _encrypt(norx, h, m, t, n, k):
+    # executor entry points; a process executor gets a pickled copy of the instance with its class and settings
+    return norx.aead_encrypt(h, m, t, n, k)
+
+
+def _decrypt(norx, h, c, t, n, k):
+    return norx.aead_decrypt(h, c, t, n, k)
+
+
+class NORXService(object):
+
+    def __init__(self, norx, executor=None, threshold=INLINE_THRESHOLD, max_pending=16, step=STREAM_SLICE):
+        self.norx = norx
+        self.executor = executor
+        self.threshold = threshold
+        self.step = step
+        self.max_pending = max_pending
+        self.loop = None
+        self.slots = None
+
+    def pending(self):
+        # semaphore of the running loop; it is created there because on Python < 3.10 a semaphore is bound
+        # to the loop that is current when it is constructed
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop, self.slots = loop, asyncio.Semaphore(self.max_pending)
+        return self.slots
+
+    async def aead_encrypt_async(self, h, m, t, n, k):
+        if len(m) < self.threshold:
+            return self.norx.aead_encrypt(h, m, t, n, k)
+        async with self.pending():
+            if self.executor is None:
+                return await self.aead_encrypt_stream(h, m, t, n, k)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, _encrypt, self.norx, h, m, t, n, k)
+
+    async def aead_decrypt_async(self, h, c, t, n, k):
+        if len(c) < self.threshold:
+            return self.norx.aead_decrypt(h, c, t, n, k)
+        async with self.pending():
+            if self.executor is None:
+                return await self.aead_decrypt_stream(h, c, t, n, k)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, _decrypt, self.norx, h, c, t, n, k)
+
+    async def aead_encrypt_stream(self, h, m, t, n, k):
+        enc = NORXEncryptor(self.norx, n, k)
+        enc.update_header(h)
+        c = bytearray()
+        x = memoryview(m)
+        for i in range(0, len(m), self.step):
+            c += enc.update(x[i:i+self.step])
+            await asyncio.sleep(0)
+        enc.update_trailer(t)
+        c += enc.finalize()
+        return bytes(c)
+
+    async def aead_decrypt_stream(self, h, c, t, n, k):
+        dec = NORXDecryptor(self.norx, n, k)
+        dec.update_header(h)
+        m = bytearray()
+        x = memoryview(c)
+        for i in range(0, len(c), self.step):
+            m += dec.update(x[i:i+self.step])
+            await asyncio.sleep(0)
+        dec.update_trailer(t)
+        try:
+            m += dec.finalize()
+        except ValueError:
+            return b''
+        return bytes(m)
+
+
+async def read_frame(reader):
+    n, = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return await reader.readexactly(n)
+
+
+def write_frame(writer, x):
+    writer.write(FRAME.pack(len(x)) + x)
+
+
+async def echo_server(service, k, host='127.0.0.1', port=0, handlers=None):
+    # every request frame is a nonce followed by a message, the reply frame is its encryption;
+    # the task of every connection is added to the set handlers if one is given
+    b = service.norx.NORX_N // 8
+
+    async def handle(reader, writer):
+        if handlers is not None:
+            handlers.add(asyncio.current_task())
+        try:
+            while True:
+                x = await read_frame(reader)
+                write_frame(writer, await service.aead_encrypt_async(b'', x[b:], b'', x[:b], k))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def load_test(service, clients=32, requests=20, sizes=(64, 1 << 10, 1 << 16)):
+    # concurrent clients against a local echo server, returns the sorted request latencies in seconds
+    norx = service.norx
+    k = os.urandom(norx.NORX_K // 8)
+    handlers = set()
+    server = await echo_server(service, k, handlers=handlers)
+    host, port = server.sockets[0].getsockname()[:2]
+    latencies = []
+
+    async def client(j):
+        reader, writer = await asyncio.open_connection(host, port)
+        for i in range(requests):
+            n, m = os.urandom(norx.NORX_N // 8), os.urandom(sizes[(i + j) % len(sizes)])
+            start = time.time()
+            write_frame(writer, n + m)
+            c = await read_frame(reader)
+            latencies.append(time.time() - start)
+            assert norx.aead_decrypt(b'', c, b'', n, k) == m
+        writer.close()
+        await writer.wait_closed()
+
+    await asyncio.gather(*[client(j) for j in range(clients)])
+    await asyncio.gather(*handlers)
+    server.close()
+    await server.wait_closed()
+    return sorted(latencies)
+
+
+def main():
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+    # workers forked from inside the running loop would inherit its sockets and keep connections open
+    context = get_context('forkserver' if sys.platform != 'win32' else 'spawn')
+    for name, executor in [('stream', None), ('process', ProcessPoolExecutor(mp_context=context))]:
+        async def run():
+            return await load_test(NORXService(select()(), executor))
+        latencies = asyncio.run(run())
+        p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+        print('{}: {} requests, p50 {:.4f} s, p99 {:.4f} s, max {:.4f} s'.format(
+            name, len(latencies), p(0.5), p(0.99), latencies[-1]))
+        if executor is not None:
+            executor.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
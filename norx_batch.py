@@ -0,0 +1,173 @@
+"""
+   Vectorised batch processing for NORX (requires NumPy).
+   ------
+
+   The 16-word states of N independent messages are kept in an array of
+   shape (N, 16) and every phase of the AEAD scheme is applied to all of
+   them at once. Messages of different lengths are handled by masking:
+   in every step only the lanes that still have a block to process in the
+   current phase are updated.
+
+   :license: CC0, see LICENSE for more details.
+"""
+
+import numpy as np
+
+
+STEPS = ((0, 4, 8, 12), (1, 5, 9, 13), (2, 6, 10, 14), (3, 7, 11, 15),
+         (0, 5, 10, 15), (1, 6, 11, 12), (2, 7, 8, 13), (3, 4, 9, 14))
+
+
+def dtype(norx):
+    return np.dtype('<u4') if norx.NORX_W == 32 else np.dtype('<u8')
+
+
+def permute(norx, X):
+    t = X.dtype.type
+    one = t(1)
+    R = [(t(r), t(norx.NORX_W - r)) for r in norx.R]
+    s = [X[:, i].copy() for i in range(16)]
+    for _ in range(norx.NORX_R):
+        for i, j, k, l in STEPS:
+            a, b, c, d = s[i], s[j], s[k], s[l]
+            a = a ^ b ^ ((a & b) << one)
+            d ^= a
+            d = (d >> R[0][0]) | (d << R[0][1])
+            c = c ^ d ^ ((c & d) << one)
+            b ^= c
+            b = (b >> R[1][0]) | (b << R[1][1])
+            a = a ^ b ^ ((a & b) << one)
+            d ^= a
+            d = (d >> R[2][0]) | (d << R[2][1])
+            c = c ^ d ^ ((c & d) << one)
+            b ^= c
+            b = (b >> R[3][0]) | (b << R[3][1])
+            s[i], s[j], s[k], s[l] = a, b, c, d
+    for i in range(16):
+        X[:, i] = s[i]
+
+
+def load(norx, xs, size):
+    # stack equally sized byte strings into an (N, size / BYTES_WORD) word array
+    for x in xs:
+        assert len(x) == size
+    return np.frombuffer(b''.join(xs), dtype=dtype(norx)).reshape(len(xs), size // norx.BYTES_WORD)
+
+
+def blocks(norx, xs):
+    # lay out the padded blocks of every input; returns the number of blocks per input, the padded
+    # data and the pad bytes as word arrays, and a word mask selecting the bytes taken from the input
+    n = norx.BYTES_RATE
+    lengths = np.array([len(x) for x in xs], dtype=np.int64)
+    counts = np.where(lengths > 0, lengths // n + 1, 0)
+    width = n * max(int(counts.max()) if len(xs) else 0, 1)
+    data = np.zeros((len(xs), width), dtype=np.uint8)
+    pad = np.zeros((len(xs), width), dtype=np.uint8)
+    mask = np.zeros((len(xs), width), dtype=np.uint8)
+    for i, x in enumerate(xs):
+        if counts[i] > 0:
+            data[i, :len(x)] = np.frombuffer(bytes(x), dtype=np.uint8)
+            mask[i, :len(x)] = 0xFF
+            pad[i, len(x)] ^= 0x01
+            pad[i, n*counts[i]-1] ^= 0x80
+    t = dtype(norx)
+    return counts, (data ^ pad).view(t), pad.view(t), mask.view(t)
+
+
+def init(norx, S, nonces, keys):
+    U = norx.U
+    N = load(norx, nonces, norx.NORX_N // 8)
+    K = load(norx, keys, norx.NORX_K // 8)
+    S[:, [0, 3, 8, 9, 10, 11, 12, 13, 14, 15]] = [U[0], U[1], U[2], U[3], U[4], U[5], U[6], U[7], U[8], U[9]]
+    S[:, 1:3] = N
+    S[:, 4:8] = K
+    S[:, 12:16] ^= np.array([norx.NORX_W, norx.NORX_R, norx.NORX_D, norx.NORX_T], dtype=S.dtype)
+    permute(norx, S)
+
+
+def absorb_data(norx, S, xs, tag):
+    counts, data, pad, mask = blocks(norx, xs)
+    words = norx.WORDS_RATE
+    tag = S.dtype.type(tag)
+    for j in range(int(counts.max()) if len(xs) else 0):
+        rows = np.nonzero(counts > j)[0]
+        X = S[rows]
+        X[:, 15] ^= tag
+        permute(norx, X)
+        X[:, :words] ^= data[rows, words*j:words*(j+1)]
+        S[rows] = X
+
+
+def encrypt_data(norx, S, xs):
+    counts, data, pad, mask = blocks(norx, xs)
+    words = norx.WORDS_RATE
+    tag = S.dtype.type(norx.PAYLOAD_TAG)
+    out = np.zeros_like(data)
+    for j in range(int(counts.max()) if len(xs) else 0):
+        rows = np.nonzero(counts > j)[0]
+        X = S[rows]
+        X[:, 15] ^= tag
+        permute(norx, X)
+        X[:, :words] ^= data[rows, words*j:words*(j+1)]
+        out[rows, words*j:words*(j+1)] = X[:, :words]
+        S[rows] = X
+    out = out.view(np.uint8)
+    return [out[i, :len(x)].tobytes() for i, x in enumerate(xs)]
+
+
+def decrypt_data(norx, S, xs):
+    counts, data, pad, mask = blocks(norx, xs)
+    words = norx.WORDS_RATE
+    tag = S.dtype.type(norx.PAYLOAD_TAG)
+    out = np.zeros_like(data)
+    for j in range(int(counts.max()) if len(xs) else 0):
+        rows = np.nonzero(counts > j)[0]
+        X = S[rows]
+        X[:, 15] ^= tag
+        permute(norx, X)
+        # the ciphertext replaces the leading state bytes, the padding is xored onto the rest
+        P, K = pad[rows, words*j:words*(j+1)], mask[rows, words*j:words*(j+1)]
+        Y = (((data[rows, words*j:words*(j+1)] ^ P) & K) | (X[:, :words] & ~K)) ^ P
+        out[rows, words*j:words*(j+1)] = X[:, :words] ^ Y
+        X[:, :words] = Y
+        S[rows] = X
+    out = out.view(np.uint8)
+    return [out[i, :len(x)].tobytes() for i, x in enumerate(xs)]
+
+
+def generate_tag(norx, S):
+    S[:, 15] ^= S.dtype.type(norx.FINAL_TAG)
+    permute(norx, S)
+    permute(norx, S)
+    return np.ascontiguousarray(S[:, :norx.WORDS_RATE]).view(np.uint8)[:, :norx.BYTES_TAG]
+
+
+def aead_encrypt(norx, hs, ms, ts, ns, ks):
+    assert len(hs) == len(ms) == len(ts) == len(ns) == len(ks)
+    if not ms:
+        return []
+    S = np.zeros((len(ms), 16), dtype=dtype(norx))
+    init(norx, S, ns, ks)
+    absorb_data(norx, S, hs, norx.HEADER_TAG)
+    cs = encrypt_data(norx, S, ms)
+    absorb_data(norx, S, ts, norx.TRAILER_TAG)
+    tags = generate_tag(norx, S)
+    return [c + tags[i].tobytes() for i, c in enumerate(cs)]
+
+
+def aead_decrypt(norx, hs, cs, ts, ns, ks):
+    assert len(hs) == len(cs) == len(ts) == len(ns) == len(ks)
+    b = norx.BYTES_TAG
+    for c in cs:
+        assert len(c) >= b
+    if not cs:
+        return []
+    S = np.zeros((len(cs), 16), dtype=dtype(norx))
+    init(norx, S, ns, ks)
+    absorb_data(norx, S, hs, norx.HEADER_TAG)
+    ms = decrypt_data(norx, S, [c[:len(c)-b] for c in cs])
+    absorb_data(norx, S, ts, norx.TRAILER_TAG)
+    t0 = np.frombuffer(b''.join(bytes(c[len(c)-b:]) for c in cs), dtype=np.uint8).reshape(len(cs), b)
+    t1 = generate_tag(norx, S)
+    valid = np.bitwise_or.reduce(t0 ^ t1, axis=1) == 0
+    return [m if valid[i] else b'' for i, m in enumerate(ms)]
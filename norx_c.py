@@ -0,0 +1,223 @@
+"""
+   C backend for NORX.
+   ------
+
+   _norx.c is compiled with the local C compiler on first import and loaded
+   through ctypes. The library is kept in a cache directory ($NORX_CACHE, or
+   norx under $XDG_CACHE_HOME or ~/.cache) under a name derived from the
+   source and the compiler, and is only put there once it passes the
+   differential self-test, so later imports load it without building or
+   testing it again. CNORX replaces the permutation and the full-block loops
+   of the reference NORX class, everything else is inherited from it.
+   Importing this module raises ImportError if the library cannot be built
+   or loaded, or if it disagrees with the reference implementation.
+
+   :license: CC0, see LICENSE for more details.
+"""
+
+import ctypes
+import os
+import subprocess
+import tempfile
+from hashlib import sha1
+
+from norx import NORX, Parameters
+
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_norx.c')
+CACHE = os.environ.get('NORX_CACHE') or \
+    os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'norx')
+CC = os.environ.get('CC', 'cc')
+ABSORB, ENCRYPT, DECRYPT, AUTHENTICATE = range(4)
+
+
+def library_path(source=SOURCE, cc=CC):
+    # cached library built from the current contents of source with the compiler cc
+    f = open(source, 'rb')
+    try:
+        digest = sha1(f.read() + cc.encode('utf-8')).hexdigest()[:16]
+    finally:
+        f.close()
+    return os.path.join(CACHE, '_norx-{}.so'.format(digest))
+
+
+def build(source=SOURCE, cc=CC):
+    # compile source into a new temporary file in the cache directory, from where it is later moved into place
+    # in one step, so that a process importing concurrently never loads a half-written library
+    try:
+        if not os.path.isdir(CACHE):
+            os.makedirs(CACHE)
+    except OSError:
+        # created concurrently, or mkstemp reports why it cannot be
+        pass
+    try:
+        fd, tmp = tempfile.mkstemp(suffix='.so', dir=CACHE)
+        os.close(fd)
+    except OSError as e:
+        raise ImportError('NORX: cannot build the C backend: {}'.format(e))
+    try:
+        subprocess.check_call([cc, '-O3', '-shared', '-fPIC', '-o', tmp, source])
+        os.chmod(tmp, 0o755)
+    except (OSError, subprocess.CalledProcessError) as e:
+        os.remove(tmp)
+        raise ImportError('NORX: cannot build the C backend: {}'.format(e))
+    return tmp
+
+
+def load(library):
+    try:
+        lib = ctypes.CDLL(library)
+    except OSError as e:
+        raise ImportError('NORX: cannot load the C backend: {}'.format(e))
+    lib.norx_permute.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    lib.norx_permute.restype = None
+    lib.norx_blocks.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_uint64, ctypes.c_void_p,
+                                ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+    lib.norx_blocks.restype = None
+    return lib
+
+
+LIBRARY = library_path()
+if os.path.exists(LIBRARY):
+    built = None
+    lib = load(LIBRARY)
+else:
+    built = build()
+    try:
+        lib = load(built)
+    except ImportError:
+        os.remove(built)
+        raise
+
+
+def address(x):
+    # address of the contents of a buffer object and a reference that keeps it alive, copies read-only
+    # buffers other than bytes
+    if isinstance(x, bytes):
+        p = ctypes.c_char_p(x)
+        return ctypes.cast(p, ctypes.c_void_p).value, p
+    try:
+        a = (ctypes.c_char * len(x)).from_buffer(x)
+    except TypeError:
+        a = ctypes.create_string_buffer(bytes(bytearray(x)), len(x))
+    return ctypes.addressof(a), a
+
+
+def permutation(w, r):
+    T = (ctypes.c_uint32 if w == 32 else ctypes.c_uint64) * 16
+    f = lib.norx_permute
+
+    def permute(S):
+        X = T(*S)
+        f(w, r, X)
+        S[:] = X
+
+    return permute
+
+
+_PARAMETERS = {}
+
+
+class CParameters(Parameters):
+
+    __slots__ = ()
+
+    def __init__(self, w, r, d, t):
+        Parameters.__init__(self, w, r, d, t)
+        object.__setattr__(self, 'permute', permutation(w, r))
+
+
+class CNORX(NORX):
+
+    __slots__ = ()
+
+    def __init__(self, w=64, r=4, d=1, t=256, workers=1, pool=None):
+        assert workers >= 1
+        if (w, r, d, t) not in _PARAMETERS:
+            _PARAMETERS[(w, r, d, t)] = CParameters(w, r, d, t)
+        self.P = _PARAMETERS[(w, r, d, t)]
+        self.WORKERS = workers
+        self.PARALLEL_THRESHOLD = 1 << 16
+        self.POOL = pool
+
+    def blocks(self, S, mode, tag, x, y, inlen):
+        # run the full blocks of the first inlen bytes of x through the C loop, returns their length
+        P = self.P
+        n = inlen // P.BYTES_RATE
+        if n > 0:
+            X = ((ctypes.c_uint32 if P.NORX_W == 32 else ctypes.c_uint64) * 16)(*S)
+            a, ka = address(x)
+            b, z, copy = None, None, False
+            if y is not None:
+                try:
+                    z = (ctypes.c_char * len(y)).from_buffer(y)
+                except TypeError:
+                    # output buffers that ctypes cannot write to get the result copied over
+                    z, copy = ctypes.create_string_buffer(n * P.BYTES_RATE), True
+                b = ctypes.addressof(z)
+            lib.norx_blocks(P.NORX_W, P.NORX_R, mode, tag, X, a, b, n)
+            if copy:
+                y[:n * P.BYTES_RATE] = z.raw
+            S[:] = X
+        return n * P.BYTES_RATE
+
+    def absorb_data(self, S, x, tag):
+        inlen = len(x)
+        if inlen > 0:
+            i = self.blocks(S, ABSORB, tag, x, None, inlen)
+            self.absorb_lastblock(S, x[i:inlen], tag)
+
+    def authenticate_data(self, S, x, inlen=None):
+        inlen = len(x) if inlen is None else inlen
+        if self.P.NORX_D != 1:
+            return NORX.authenticate_data(self, S, x, inlen)
+        if inlen > 0:
+            i = self.blocks(S, AUTHENTICATE, self.P.PAYLOAD_TAG, x, None, inlen)
+            self.authenticate_lastblock(S, x[i:inlen])
+
+    def encrypt_data(self, S, x, y=None, inlen=None):
+        inlen = len(x) if inlen is None else inlen
+        y = bytearray(inlen) if y is None else y
+        if self.P.NORX_D != 1:
+            return self.process_data_parallel(S, x, y, inlen, 'encrypt')
+        if inlen > 0:
+            i = self.blocks(S, ENCRYPT, self.P.PAYLOAD_TAG, x, y, inlen)
+            self.encrypt_lastblock(S, x[i:inlen], y, i)
+        return y
+
+    def decrypt_data(self, S, x, y=None, inlen=None):
+        inlen = len(x) if inlen is None else inlen
+        y = bytearray(inlen) if y is None else y
+        if self.P.NORX_D != 1:
+            return self.process_data_parallel(S, x, y, inlen, 'decrypt')
+        if inlen > 0:
+            i = self.blocks(S, DECRYPT, self.P.PAYLOAD_TAG, x, y, inlen)
+            self.decrypt_lastblock(S, x[i:inlen], y, i)
+        return y
+
+
+def verify():
+    # differential self-test against the reference implementation
+    for w in [32, 64]:
+        m = bytearray((i * 197 + 123) & 255 for i in range(3 * 10 * w // 8 + 5))
+        k, n = bytes(m[:4*w//8]), bytes(m[:2*w//8])
+        for r in [1, 4]:
+            a, b = NORX(w, r, 1, 4*w), CNORX(w, r, 1, 4*w)
+            S = [(i * 0x9E3779B97F4A7C15) & a.M for i in range(16)]
+            T = list(S)
+            a.permute(S)
+            b.permute(T)
+            c = a.aead_encrypt(m, m, m, n, k)
+            if S != T or b.aead_encrypt(m, m, m, n, k) != c or b.aead_decrypt(m, c, m, n, k) != bytes(m) or \
+                    b.aead_decrypt(m, c, m, n, k, True) != bytes(m):
+                raise ImportError('NORX: C backend disagrees with the reference implementation')
+
+
+if built is not None:
+    # a new library only gets its cached name once it passed the self-test
+    try:
+        verify()
+        getattr(os, 'replace', os.rename)(built, LIBRARY)
+    finally:
+        if os.path.exists(built):
+            os.remove(built)
@@ -0,0 +1,139 @@
+"""
+   Differential test harness for NORX backends.
+   ------
+
+   A candidate class with the constructor of NORX is run against the
+   reference NORX class on random configurations (w, r, d, t), random
+   header, message and trailer lengths around multiples of the rate, and
+   tampered inputs. Every case must give identical ciphertexts, decrypt to
+   the message with and without verify_first, and reject a tampered
+   ciphertext, header, trailer or nonce. The speedup of the candidate over
+   the reference is recorded per case.
+
+   Usage: python norx_check.py [--backend c|python] [--count N] [--seed S] [--json FILE]
+
+   :license: CC0, see LICENSE for more details.
+"""
+
+from __future__ import print_function
+
+import json
+import random
+import sys
+from argparse import ArgumentParser
+from timeit import default_timer
+
+from norx import NORX
+
+
+class CheckError(AssertionError):
+    # raised explicitly rather than by assert, so that the checks also run under python -O
+    pass
+
+
+def expect(condition, name, message):
+    if not condition:
+        raise CheckError('{}: {}'.format(name, message))
+
+
+def configuration(rng):
+    w = rng.choice([32, 64])
+    return w, rng.randint(1, 6), rng.choice([0, 1, 1, 2, 3, 4]), 8 * rng.randint(4, 10 * w // 8)
+
+
+def length(rng, b):
+    # mostly lengths next to a multiple of the rate b, otherwise anything up to four blocks
+    if rng.random() < 0.75:
+        return max(0, b * rng.randint(0, 3) + rng.randint(-1, 1))
+    return rng.randint(0, 4 * b)
+
+
+def random_bytes(rng, n):
+    return bytes(bytearray(rng.getrandbits(8) for i in range(n)))
+
+
+def tamper(rng, x):
+    # copy of the non-empty x with one random bit flipped
+    y = bytearray(x)
+    y[rng.randrange(len(y))] ^= 1 << rng.randrange(8)
+    return bytes(y)
+
+
+def cases(seed=0, count=100):
+    # (w, r, d, t) and (h, m, t, n, k) of every case
+    rng = random.Random(seed)
+    for i in range(count):
+        w, r, d, t = configuration(rng)
+        b = 10 * w // 8
+        yield (w, r, d, t), tuple(random_bytes(rng, l) for l in
+                                  [length(rng, b), length(rng, b), length(rng, b), 2*w//8, 4*w//8])
+
+
+def timed(f, repeat):
+    # result and best time of repeat calls of f
+    best = None
+    for i in range(repeat):
+        start = default_timer()
+        x = f()
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return x, best
+
+
+def check_case(candidate, params, record, seed=0, reference=NORX, repeat=3):
+    # compare candidate against reference on one case, raises CheckError on any difference
+    rng = random.Random(seed)
+    h, m, t, n, k = record
+    a, b = reference(*params), candidate(*params)
+    c, before = timed(lambda: a.aead_encrypt(h, m, t, n, k), repeat)
+    d, after = timed(lambda: b.aead_encrypt(h, m, t, n, k), repeat)
+    name = 'w{}/r{}/d{}/t{} h{} m{} t{}'.format(params[0], params[1], params[2], params[3], len(h), len(m), len(t))
+    expect(c == d, name, 'ciphertexts differ')
+    for verify_first in [False, True]:
+        expect(b.aead_decrypt(h, c, t, n, k, verify_first) == m, name, 'decryption failed')
+    S = [rng.getrandbits(params[0]) for i in range(16)]
+    T = list(S)
+    a.permute(S)
+    b.permute(T)
+    expect(S == T, name, 'permutations differ')
+    forgeries = [(h, tamper(rng, c), t, n), (h, c, t, tamper(rng, n))]
+    forgeries += [(tamper(rng, h), c, t, n)] if h else []
+    forgeries += [(h, c, tamper(rng, t), n)] if t else []
+    for x in forgeries:
+        for verify_first in [False, True]:
+            expect(b.aead_decrypt(x[0], x[1], x[2], x[3], k, verify_first) == b'', name, 'forgery accepted')
+            expect(a.aead_decrypt(x[0], x[1], x[2], x[3], k, verify_first) == b'', name, 'reference accepted forgery')
+    return {'case': name, 'reference': before, 'candidate': after, 'speedup': before / max(after, 1e-9)}
+
+
+def check(candidate, seed=0, count=100, reference=NORX, repeat=3):
+    # results of check_case for the count random cases of seed
+    return [check_case(candidate, params, record, seed + i, reference, repeat)
+            for i, (params, record) in enumerate(cases(seed, count))]
+
+
+def main(argv=None):
+    parser = ArgumentParser(description='Differential tests of a NORX backend against the reference.')
+    parser.add_argument('--backend', help='backend to check, see norx_backend')
+    parser.add_argument('--count', type=int, default=100, help='number of random cases')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random cases')
+    parser.add_argument('--json', help='write the per-case results to this file')
+    args = parser.parse_args(argv)
+    from norx_backend import select
+    candidate = select(args.backend)
+    try:
+        results = check(candidate, args.seed, args.count)
+    except CheckError as e:
+        print('{} FAILED: {}'.format(candidate.__name__, e))
+        return 1
+    speedups = sorted(x['speedup'] for x in results)
+    print('{}: {} cases passed, speedup min {:.2f}x, median {:.2f}x, max {:.2f}x'.format(
+        candidate.__name__, len(results), speedups[0], speedups[len(speedups) // 2], speedups[-1]))
+    if args.json:
+        json.dump({'backend': candidate.__name__, 'seed': args.seed, 'results': results},
+                  open(args.json, 'w'), indent=1, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
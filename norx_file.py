@@ -0,0 +1,268 @@
+"""
+   Chunked file encryption for NORX.
+   ------
+
+   A file is split into chunks of a fixed size that are authenticated
+   independently, so they can be processed in parallel and decrypted one
+   at a time. The framed format is
+
+       header | frame_0 | frame_1 | ... | frame_{count-1}
+
+   where the header is HEADER followed by the base nonce and frame i is
+   aead_encrypt(header + index(i, final), chunk_i, b'', nonce(i), key).
+   Every frame but the last holds exactly chunk + BYTES_TAG bytes, so the
+   offset of a frame follows from its index. The per-chunk nonce binds the
+   chunk index, the associated data additionally binds the file header and
+   marks the final chunk, which stops frames from being reordered, mixed
+   between files or truncated.
+
+   Usage: python -m norx encrypt|decrypt [options] infile outfile
+
+   :license: CC0, see LICENSE for more details.
+"""
+
+import os
+import sys
+from binascii import Error, unhexlify
+from argparse import ArgumentParser
+from mmap import mmap, ACCESS_READ
+from struct import Struct, error as StructError
+
+from norx import NORXDecryptor
+from norx_backend import select
+
+
+MAGIC = b'NORX'
+VERSION = 1
+CHUNK = 1 << 20
+MIN_TAG = 64
+HEADER = Struct('<4sBBBBHIQ')
+INDEX = Struct('<QB')
+
+
+class FormatError(ValueError):
+    pass
+
+
+def check_tag(w, t):
+    # shorter tags, down to none at all for t < 8, would leave the chunks effectively unauthenticated
+    if t % 8 != 0 or not MIN_TAG <= t <= 10 * w:
+        raise FormatError('NORX: tag size must be a multiple of 8 between {} and {} bits'.format(MIN_TAG, 10 * w))
+
+
+def check_parameters(w, r, d, t, chunk):
+    # every value that goes into the header must fit its field, see HEADER
+    if w not in [32, 64]:
+        raise FormatError('NORX: word size must be 32 or 64 bits')
+    if not 1 <= r <= 255:
+        raise FormatError('NORX: number of rounds must be between 1 and 255')
+    if not 0 <= d <= 255:
+        raise FormatError('NORX: parallelism degree must be between 0 and 255')
+    check_tag(w, t)
+    if not 1 <= chunk < 1 << 32:
+        raise FormatError('NORX: chunk size must be between 1 and {} bytes'.format((1 << 32) - 1))
+
+
+def check_key(norx, k):
+    if len(k) != norx.NORX_K // 8:
+        raise FormatError('NORX: key must be {} bytes'.format(norx.NORX_K // 8))
+
+
+def chunk_nonce(n, i):
+    # xor the chunk index into the first 8 bytes of the base nonce
+    x, = Struct('<Q').unpack_from(n)
+    return Struct('<Q').pack(x ^ i) + n[8:]
+
+
+def chunk_count(size, chunk):
+    # an empty file still gets one (empty) final chunk
+    return max(1, (size + chunk - 1) // chunk)
+
+
+def read_header(f, cls=None):
+    # NORX instance of class cls, or of the selected backend, chunk size, file size and header of the open file f
+    f.seek(0)
+    x = f.read(HEADER.size)
+    if len(x) != HEADER.size:
+        raise FormatError('NORX: truncated header')
+    magic, version, w, r, d, t, chunk, size = HEADER.unpack(x)
+    if magic != MAGIC or version != VERSION or w not in [32, 64] or r == 0 or chunk == 0:
+        raise FormatError('NORX: invalid header')
+    check_tag(w, t)
+    n = f.read(2 * w // 8)
+    if len(n) != 2 * w // 8:
+        raise FormatError('NORX: truncated header')
+    return (select() if cls is None else cls)(w, r, d, t), chunk, size, x + n
+
+
+def frame(norx, h, chunk, size, i):
+    # offset and length of the plaintext and of the frame of chunk i
+    count = chunk_count(size, chunk)
+    if not 0 <= i < count:
+        raise IndexError('NORX: chunk index out of range')
+    m = min(chunk, size - i * chunk)
+    return i * chunk, m, len(h) + i * (chunk + norx.BYTES_TAG), m + norx.BYTES_TAG
+
+
+def associated_data(h, i, count):
+    return h + INDEX.pack(i, i == count - 1)
+
+
+def encrypt_chunks(args):
+    src, dst, k, cls, indices = args
+    f = open(src, 'rb')
+    g = open(dst, 'r+b')
+    try:
+        norx, chunk, size, h = read_header(g, cls)
+        mm = mmap(f.fileno(), 0, access=ACCESS_READ) if size > 0 else b''
+        n = h[HEADER.size:]
+        for i in indices:
+            a, m, b, c = frame(norx, h, chunk, size, i)
+            g.seek(b)
+            g.write(norx.aead_encrypt(associated_data(h, i, chunk_count(size, chunk)), mm[a:a+m], b'',
+                                      chunk_nonce(n, i), k))
+        if size > 0:
+            mm.close()
+    finally:
+        f.close()
+        g.close()
+
+
+def decrypt_chunks(args):
+    src, dst, k, cls, indices = args
+    f = open(src, 'rb')
+    g = open(dst, 'r+b')
+    try:
+        norx, chunk, size, h = read_header(f, cls)
+        for i in indices:
+            g.seek(frame(norx, h, chunk, size, i)[0])
+            g.write(decrypt_chunk(f, k, i, norx, chunk, size, h))
+    finally:
+        f.close()
+        g.close()
+
+
+def decrypt_chunk(f, k, i, norx=None, chunk=None, size=None, h=None):
+    # decrypt and authenticate chunk i of the open encrypted file f without reading the other chunks
+    if norx is None:
+        norx, chunk, size, h = read_header(f)
+        check_key(norx, k)
+    a, m, b, c = frame(norx, h, chunk, size, i)
+    f.seek(b)
+    x = f.read(c)
+    if len(x) != c:
+        raise FormatError('NORX: truncated chunk {}'.format(i))
+    dec = NORXDecryptor(norx, chunk_nonce(h[HEADER.size:], i), k)
+    dec.update_header(associated_data(h, i, chunk_count(size, chunk)))
+    y = dec.update(x)
+    try:
+        return y + dec.finalize()
+    except ValueError:
+        raise FormatError('NORX: authentication of chunk {} failed'.format(i))
+
+
+def run(task, args, count, workers):
+    # distribute contiguous ranges of chunk indices over a process pool, one worker per core if workers is None;
+    # multiprocessing is only imported if more than one chunk is processed
+    if workers is None and count > 1:
+        from multiprocessing import cpu_count
+        workers = cpu_count()
+    workers = min(workers or 1, count)
+    groups = [range(count * j // workers, count * (j+1) // workers) for j in range(workers)]
+    if workers > 1:
+        from multiprocessing import Pool
+        pool = Pool(workers)
+        try:
+            pool.map(task, [args + (g,) for g in groups])
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        task(args + (groups[0],))
+
+
+def encrypt_file(src, dst, k, w=64, r=4, d=1, t=256, chunk=CHUNK, workers=1, n=None, cls=None):
+    # cls is the NORX class the chunks are sealed with, by default that of the selected backend; dst is removed
+    # if encryption fails, so that no partial output is left behind
+    check_parameters(w, r, d, t, chunk)
+    cls = select() if cls is None else cls
+    norx = cls(w, r, d, t)
+    check_key(norx, k)
+    n = os.urandom(norx.NORX_N // 8) if n is None else n
+    if len(n) != norx.NORX_N // 8:
+        raise FormatError('NORX: nonce must be {} bytes'.format(norx.NORX_N // 8))
+    size = os.path.getsize(src)
+    count = chunk_count(size, chunk)
+    h = HEADER.pack(MAGIC, VERSION, w, r, d, t, chunk, size) + n
+    g = open(dst, 'wb')
+    try:
+        try:
+            g.write(h)
+            g.truncate(len(h) + size + count * norx.BYTES_TAG)
+        finally:
+            g.close()
+        run(encrypt_chunks, (src, dst, k, cls), count, workers)
+    except Exception:
+        os.remove(dst)
+        raise
+
+
+def decrypt_file(src, dst, k, workers=1, cls=None):
+    cls = select() if cls is None else cls
+    f = open(src, 'rb')
+    try:
+        norx, chunk, size, h = read_header(f, cls)
+        check_key(norx, k)
+        count = chunk_count(size, chunk)
+        f.seek(0, 2)
+        if f.tell() != len(h) + size + count * norx.BYTES_TAG:
+            raise FormatError('NORX: invalid file size')
+    finally:
+        f.close()
+    g = open(dst, 'wb')
+    try:
+        g.truncate(size)
+    finally:
+        g.close()
+    try:
+        run(decrypt_chunks, (src, dst, k, cls), count, workers)
+    except FormatError:
+        os.remove(dst)
+        raise
+
+
+def main(argv=None):
+    parser = ArgumentParser(prog='python -m norx', description='Chunked NORX file encryption.')
+    parser.add_argument('command', choices=['encrypt', 'decrypt'])
+    parser.add_argument('infile')
+    parser.add_argument('outfile')
+    parser.add_argument('-k', '--key', required=True, help='key in hex')
+    parser.add_argument('-w', type=int, default=64, choices=[32, 64], help='word size')
+    parser.add_argument('-r', type=int, default=4, help='number of rounds')
+    parser.add_argument('-d', type=int, default=1, help='parallelism degree')
+    parser.add_argument('-t', type=int, default=256, help='tag size in bits')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK, help='bytes per chunk')
+    parser.add_argument('--chunk', type=int, help='decrypt only the chunk with this index')
+    parser.add_argument('--workers', type=int, help='number of worker processes, default one per core')
+    args = parser.parse_args(argv)
+    try:
+        k = unhexlify(args.key)
+        if args.command == 'encrypt':
+            encrypt_file(args.infile, args.outfile, k, args.w, args.r, args.d, args.t, args.chunk_size, args.workers)
+        elif args.chunk is not None:
+            f = open(args.infile, 'rb')
+            try:
+                m = decrypt_chunk(f, k, args.chunk)
+            finally:
+                f.close()
+            g = open(args.outfile, 'wb')
+            try:
+                g.write(m)
+            finally:
+                g.close()
+        else:
+            decrypt_file(args.infile, args.outfile, k, args.workers)
+    except (AssertionError, Error, IndexError, TypeError, FormatError, StructError, IOError, OSError) as e:
+        sys.stderr.write('{}\n'.format(str(e) or 'NORX: invalid arguments'))
+        return 1
+    return 0
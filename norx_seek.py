@@ -0,0 +1,228 @@
+"""
+   Seekable NORX container.
+   ------
+
+   Data is split into fixed-size segments that are sealed independently,
+   so any byte range can be read by decrypting only the segments it
+   touches. The container is written in one pass, without knowing the
+   size in advance:
+
+       header | segment_0 | ... | segment_{count-1} | index | MAGIC
+
+   where the header is HEADER followed by the base nonce, segment i is
+   aead_encrypt(header + INDEX(i, final), data_i, b'', nonce(i), key) and
+   the index footer is aead_encrypt(header + INDEX(LAST, 2),
+   FOOTER(count, size), b'', nonce(LAST), key) with LAST = 2^64 - 1.
+   Every segment but the last holds exactly segment + BYTES_TAG bytes, so
+   the authenticated count and size locate every segment. The per-segment nonces
+   and associated data are those of norx_file; the final flag and the
+   index stop segments from being reordered, mixed between containers or
+   truncated.
+
+   Usage: with NORXWriter(open(path, 'wb'), k) as w: w.write(data)
+          or w = NORXWriter(f, k); w.write(data); w.finish()
+          r = NORXReader(open(path, 'rb'), k); r.seek(offset); r.read(size)
+
+   :license: CC0, see LICENSE for more details.
+"""
+
+import io
+import os
+from collections import OrderedDict
+from struct import Struct
+
+from norx import NORXKey
+from norx_backend import select
+from norx_file import INDEX, FormatError, check_tag, chunk_nonce
+
+
+MAGIC = b'NRXS'
+VERSION = 1
+SEGMENT = 1 << 16
+HEADER = Struct('<4sBBBBHI')
+FOOTER = Struct('<QQ')
+LAST = (1 << 64) - 1
+
+
+def read_header(f, cls=None):
+    # NORX instance of class cls, or of the selected backend, segment size and header of the open file f
+    f.seek(0)
+    x = f.read(HEADER.size)
+    if len(x) != HEADER.size:
+        raise FormatError('NORX: truncated header')
+    magic, version, w, r, d, t, segment = HEADER.unpack(x)
+    if magic != MAGIC or version != VERSION or w not in [32, 64] or r == 0 or segment == 0:
+        raise FormatError('NORX: invalid header')
+    check_tag(w, t)
+    n = f.read(2 * w // 8)
+    if len(n) != 2 * w // 8:
+        raise FormatError('NORX: truncated header')
+    return (select() if cls is None else cls)(w, r, d, t), segment, x + n
+
+
+def seal(key, h, i, flag, m):
+    return key.aead_encrypt(h + INDEX.pack(i, flag), m, b'', chunk_nonce(h[HEADER.size:], i))
+
+
+def unseal(key, h, i, flag, c, length):
+    # plaintext of the sealed c of the given length, raises FormatError if c does not authenticate; an empty
+    # plaintext is checked against the expected tag, since aead_decrypt also returns b'' on failure
+    a, n = h + INDEX.pack(i, flag), chunk_nonce(h[HEADER.size:], i)
+    m = key.aead_decrypt(a, c, b'', n)
+    if len(m) != length or (length == 0 and key.norx.verify_tag(c, key.aead_encrypt(a, b'', b'', n)) != 0):
+        raise FormatError('NORX: authentication of {} failed'.format('index' if i == LAST else 'segment {}'.format(i)))
+    return m
+
+
+class NORXWriter(io.RawIOBase):
+    # writes a container to the open binary file f; segments are sealed as soon as the next byte arrives,
+    # finish() seals the last segment and appends the index, and a with block calls it on normal exit. close(),
+    # also when called by the garbage collector, does not, so an abandoned container cannot be read as
+    # complete. Segments are sealed with the NORX class cls, by default that of the selected backend. f is left
+    # open.
+
+    def __init__(self, f, k, w=64, r=4, d=1, t=256, segment=SEGMENT, n=None, cls=None):
+        io.RawIOBase.__init__(self)
+        check_tag(w, t)
+        norx = (select() if cls is None else cls)(w, r, d, t)
+        assert len(k) == norx.NORX_K // 8
+        assert segment > 0
+        n = os.urandom(norx.NORX_N // 8) if n is None else n
+        assert len(n) == norx.NORX_N // 8
+        self.f = f
+        self.key = NORXKey(norx, k)
+        self.segment = segment
+        self.h = HEADER.pack(MAGIC, VERSION, w, r, d, t, segment) + n
+        self.buf = bytearray()
+        self.count = 0
+        self.size = 0
+        f.write(self.h)
+
+    def writable(self):
+        return True
+
+    def write(self, x):
+        # a full segment is only sealed once more data follows, because the last one is marked final
+        self.buf += bytearray(x)
+        while len(self.buf) > self.segment:
+            self.flush_segment(self.buf[:self.segment], 0)
+            del self.buf[:self.segment]
+        return len(x)
+
+    def flush_segment(self, m, final):
+        self.f.write(seal(self.key, self.h, self.count, final, bytes(m)))
+        self.count += 1
+        self.size += len(m)
+
+    def finish(self):
+        if self.closed:
+            raise ValueError('NORX: container already closed')
+        self.flush_segment(self.buf, 1)
+        self.buf = bytearray()
+        self.f.write(seal(self.key, self.h, LAST, 2, FOOTER.pack(self.count, self.size)))
+        self.f.write(MAGIC)
+        self.f.flush()
+        self.close()
+
+    def __exit__(self, *exc):
+        # an exception leaves the container without index
+        if exc[0] is None and not self.closed:
+            self.finish()
+        self.close()
+
+
+class NORXReader(io.RawIOBase):
+    # random-access reads of the container in the open binary file f. Only the segments that a read touches are
+    # decrypted and authenticated, the last cache of them are kept; if segment i + 1 is read after segment i,
+    # the frames of up to prefetch further segments are read with it and decrypted ahead. f is left open.
+
+    def __init__(self, f, k, cache=8, prefetch=2, cls=None):
+        io.RawIOBase.__init__(self)
+        assert cache > prefetch >= 0
+        self.f = f
+        norx, self.segment, self.h = read_header(f, cls)
+        assert len(k) == norx.NORX_K // 8
+        self.key = NORXKey(norx, k)
+        self.frame = self.segment + norx.BYTES_TAG
+        self.count, self.size = self.read_index()
+        self.capacity = cache
+        self.prefetch = prefetch
+        self.cache = OrderedDict()
+        self.last = -1
+        self.pos = 0
+        self.hits = 0
+        self.misses = 0
+
+    def read_index(self):
+        b = self.key.norx.BYTES_TAG
+        f = self.f
+        f.seek(0, 2)
+        end = f.tell() - len(MAGIC) - FOOTER.size - b
+        if end < len(self.h):
+            raise FormatError('NORX: truncated container')
+        f.seek(end)
+        x = f.read(FOOTER.size + b + len(MAGIC))
+        if x[-len(MAGIC):] != MAGIC:
+            raise FormatError('NORX: container without index')
+        count, size = FOOTER.unpack(unseal(self.key, self.h, LAST, 2, x[:-len(MAGIC)], FOOTER.size))
+        if count == 0 or count != max(1, (size + self.segment - 1) // self.segment) or \
+           end != len(self.h) + size + count * b:
+            raise FormatError('NORX: invalid index')
+        return count, size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        pos = [offset, self.pos + offset, self.size + offset][whence]
+        if pos < 0:
+            raise ValueError('NORX: negative seek position')
+        self.pos = pos
+        return pos
+
+    def load(self, i):
+        # plaintext of segment i, from the cache or decrypted together with the prefetched segments
+        m = self.cache.pop(i, None)
+        if m is None:
+            self.misses += 1
+            j = min(self.count, i + 1 + (self.prefetch if i == self.last + 1 else 0))
+            self.f.seek(len(self.h) + i * self.frame)
+            x = self.f.read(self.frame * (j - i))
+            b = self.key.norx.BYTES_TAG
+            for l in range(i, j):
+                length = min(self.segment, self.size - l * self.segment)
+                c = x[(l - i) * self.frame:(l - i) * self.frame + length + b]
+                if len(c) != length + b:
+                    raise FormatError('NORX: truncated segment {}'.format(l))
+                if l == i or l not in self.cache:
+                    y = unseal(self.key, self.h, l, l == self.count - 1, c, length)
+                    if l == i:
+                        m = y
+                    else:
+                        self.cache[l] = y
+        else:
+            self.hits += 1
+        self.cache[i] = m
+        while len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+        self.last = i
+        return m
+
+    def readinto(self, b):
+        # copy up to len(b) bytes from the current position, returns the number of bytes copied
+        view = memoryview(b)
+        n = 0
+        while n < len(view) and self.pos < self.size:
+            i, j = divmod(self.pos, self.segment)
+            m = self.load(i)
+            l = min(len(m) - j, len(view) - n)
+            view[n:n+l] = m[j:j+l]
+            n += l
+            self.pos += l
+        return n
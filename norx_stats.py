@@ -0,0 +1,170 @@
+"""
+   Opt-in instrumentation for NORX.
+   ------
+
+   NORX.instrumented() returns a copy of an instance whose class wraps the
+   message-level phases (init, header, encrypt, decrypt, authenticate,
+   trailer, tag) and whose parameter object counts permutations. Plain NORX
+   instances are left untouched, so instrumentation costs nothing unless it
+   is used. Permutations outside of a phase, e.g. of the block-wise calls
+   of NORXStream, are recorded under 'other'; work done in pool workers is
+   not recorded.
+
+   Usage: s = norx.instrumented()
+          s.aead_encrypt(h, m, t, n, k)
+          s.stats.snapshot(), s.stats.prometheus(), serve(s.stats, port)
+
+   :license: CC0, see LICENSE for more details.
+"""
+
+from timeit import default_timer
+
+from norx import Parameters
+
+
+PHASES = ('init', 'header', 'encrypt', 'decrypt', 'authenticate', 'trailer', 'tag', 'other')
+COUNTERS = ('calls', 'bytes', 'blocks', 'permutations', 'seconds')
+HELP = {'calls': 'Calls per phase.', 'bytes': 'Bytes processed per phase.',
+        'blocks': 'Rate blocks processed per phase.', 'permutations': 'Permutations per phase.',
+        'seconds': 'Wall time per phase in seconds.'}
+
+
+class Stats(object):
+    # counters per phase, shared by every instance instrumented with the same object
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for name in COUNTERS:
+            setattr(self, name, dict((phase, 0) for phase in PHASES))
+        self.phase = 'other'
+
+    def measure(self, phase, size, blocks, f, *args):
+        outer, self.phase = self.phase, phase
+        start = default_timer()
+        try:
+            return f(*args)
+        finally:
+            self.seconds[phase] += default_timer() - start
+            self.calls[phase] += 1
+            self.bytes[phase] += size
+            self.blocks[phase] += blocks
+            self.phase = outer
+
+    def snapshot(self):
+        return dict((phase, dict((name, getattr(self, name)[phase]) for name in COUNTERS)) for phase in PHASES)
+
+    def prometheus(self, prefix='norx', labels=None):
+        # text exposition format, one counter family per statistic with the phase as label
+        extra = ''.join(',{}="{}"'.format(k, v) for k, v in sorted((labels or {}).items()))
+        lines = []
+        for name in COUNTERS:
+            metric = '{}_{}_total'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(metric, HELP[name]))
+            lines.append('# TYPE {} counter'.format(metric))
+            for phase in PHASES:
+                lines.append('{}{{phase="{}"{}}} {}'.format(metric, phase, extra, getattr(self, name)[phase]))
+        return '\n'.join(lines) + '\n'
+
+
+def counted(P, stats):
+    # copy of the parameter object P whose permutation counts its calls into stats
+    Q = object.__new__(type(P))
+    for name in Parameters.__slots__:
+        object.__setattr__(Q, name, getattr(P, name))
+    permute = P.permute
+    permutations = stats.permutations
+
+    def f(S):
+        permutations[stats.phase] += 1
+        permute(S)
+
+    object.__setattr__(Q, 'permute', f)
+    return Q
+
+
+def payload_blocks(norx, inlen):
+    return inlen // norx.BYTES_RATE + 1 if inlen > 0 else 0
+
+
+class Instrumented(object):
+    # mixin over NORX or one of its subclasses, see instrumented_class
+
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        super(Instrumented, self).__init__(*args, **kwargs)
+        self.stats = Stats()
+        self.P = counted(self.P, self.stats)
+
+    def init(self, S, n, k):
+        return self.stats.measure('init', len(n) + len(k), 0, super(Instrumented, self).init, S, n, k)
+
+    def init_scheduled(self, S, n, K):
+        return self.stats.measure('init', len(n), 0, super(Instrumented, self).init_scheduled, S, n, K)
+
+    def absorb_data(self, S, x, tag):
+        phase = {self.HEADER_TAG: 'header', self.TRAILER_TAG: 'trailer'}.get(tag, 'other')
+        return self.stats.measure(phase, len(x), payload_blocks(self, len(x)),
+                                  super(Instrumented, self).absorb_data, S, x, tag)
+
+    def encrypt_data(self, S, x, y=None, inlen=None):
+        inlen = len(x) if inlen is None else inlen
+        return self.stats.measure('encrypt', inlen, payload_blocks(self, inlen),
+                                  super(Instrumented, self).encrypt_data, S, x, y, inlen)
+
+    def decrypt_data(self, S, x, y=None, inlen=None):
+        inlen = len(x) if inlen is None else inlen
+        return self.stats.measure('decrypt', inlen, payload_blocks(self, inlen),
+                                  super(Instrumented, self).decrypt_data, S, x, y, inlen)
+
+    def authenticate_data(self, S, x, inlen=None):
+        inlen = len(x) if inlen is None else inlen
+        return self.stats.measure('authenticate', inlen, payload_blocks(self, inlen),
+                                  super(Instrumented, self).authenticate_data, S, x, inlen)
+
+    def generate_tag(self, S):
+        return self.stats.measure('tag', 0, 0, super(Instrumented, self).generate_tag, S)
+
+    def blocks(self, S, mode, tag, x, y, inlen):
+        # full-block loops of the C backend permute outside of the counted parameter object
+        n = super(Instrumented, self).blocks(S, mode, tag, x, y, inlen)
+        self.stats.permutations[self.stats.phase] += n // self.BYTES_RATE
+        return n
+
+
+_CLASSES = {}
+
+
+def instrumented_class(cls):
+    # instrumented subclass of cls, registered in this module so that it can be pickled by name
+    if cls not in _CLASSES:
+        name = 'Instrumented' + cls.__name__
+        _CLASSES[cls] = type(name, (Instrumented, cls), {'__slots__': ('stats',), '__module__': __name__})
+        globals()[name] = _CLASSES[cls]
+    return _CLASSES[cls]
+
+
+def instrument(norx, stats=None):
+    # instrumented copy of norx that records into stats, or into a new Stats object
+    assert not isinstance(norx, Instrumented)
+    cls = instrumented_class(type(norx))
+    x = object.__new__(cls)
+    x.stats = Stats() if stats is None else stats
+    x.P = counted(norx.P, x.stats)
+    x.WORKERS = norx.WORKERS
+    x.PARALLEL_THRESHOLD = norx.PARALLEL_THRESHOLD
+    x.POOL = norx.POOL
+    return x
+
+
+def serve(stats, port=9464, host='127.0.0.1'):
+    # serve the Prometheus text format of stats on http://host:port/ until interrupted
+    from wsgiref.simple_server import make_server
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4')])
+        return [stats.prometheus().encode('ascii')]
+
+    make_server(host, port, app).serve_forever()